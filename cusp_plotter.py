@@ -7,6 +7,7 @@
 
 import mpmath as mp
 import riley
+import numpy as np
 import matplotlib.pyplot as plt
 
 
@@ -17,17 +18,10 @@ max_denom = 20
 #
 
 
-cusps = []
-for q in range(1,max_denom+1):
-    for p in range(1,2*q+1):
-        if mp.gcd(p,q) == 1:
-          try:
-              cusps.append(riley.cusp_point(ordera,orderb,p,q))
-          except RuntimeError as e:
-              pass
-              #raise RuntimeError(f'cusp computation failed at (p,q) = {(p,q)}') from e
+table = riley.cusp_table(ordera,orderb,max_denom) # Cusps which could not be found are nan, and are not drawn.
+cusps = table[~np.isnan(table)]
 
-plt.scatter([mp.re(t) for t in cusps],[mp.im(t) for t in cusps],marker=".",s=5,linewidths=0,c='k')
+plt.scatter(cusps.real,cusps.imag,marker=".",s=5,linewidths=0,c='k')
 plt.axis('equal')
 plt.axis([-4,4,-3,3])
 plt.tight_layout()
@@ -5,14 +5,19 @@
 
     The limit point seeds are the fixed points of the 0/1, 1/1, and 1/2 Farey words at the given cusp point.
 
-    Limit set is plotted using datashader and dask --- thus this script will not run into any of the memory
-    issues that cusps.py has.
+    Limit set points are binned into an image as they are computed (see kleinian.limit_set_density) and the image is
+    shaded using datashader --- thus this script will not run into any of the memory issues that cusps.py has.
 
     Options to change:
         p, q -- orders of the elliptic elements (set to mp.inf for the parabolic case)
         r, s -- slope of the desired cusp
-        per_batch, batches -- you should be able to run kleinian.limit_set_markov with reps set to `per_batch'; we do this `batches' times (so we don't run out of RAM).
+        reps -- number of words to generate
         depth -- maximum word length to compute orbits with
+        window, resolution -- region of the plane to plot and size of the output image in pixels
+        random_seed -- seed of the random walks, so that a render can be reproduced exactly
+
+    The histogram is checkpointed to {filename}.npz while it is computed; if the script is killed, running it again with the
+    same options resumes from the checkpoint.
 
     Output image filename is cusp_{r}_{s}_elliptic_{p}_{q}_shaded.png (in the current directory).
 """
@@ -22,12 +27,9 @@ import mpmath as mp
 import kleinian
 import riley
 import farey
-import datashader as ds
+import numpy as np
+import xarray as xr
 import datashader.transfer_functions as tf
-import pandas
-import dask
-import dask.dataframe as dd
-from dask.delayed import delayed
 from datashader.utils import export_image
 
 # Orders of elliptics
@@ -40,9 +42,11 @@ s = 2
 
 filename = f'cusp_{r}_{s}_elliptic_{p}_{q}_shaded'
 
-per_batch = 100000
-batches = 20
+reps = 2000000
 depth = 15
+window = (-4,4,-4,4) # xmin, xmax, ymin, ymax
+resolution = (4000,4000)
+random_seed = 0
 
 mu = riley.cusp_point(p,q,r,s)
 
@@ -57,24 +61,14 @@ seeds = farey.fixed_points(0,1,mu,alpha,beta)\
 
 print("Found fixed points.",flush=True)
 
-dask.config.set(scheduler='single-threaded') # We are already running in parallel in each batch; if we don't do this then Dask launches
-                                             # many copies of one_batch() and we get killed by the OOM killer.
-def one_batch(batch):
-  print(f"Running batch {batch+1}/{batches}")
-  ls = kleinian.limit_set_markov([X,Y],seeds,depth,per_batch)
-  df = pandas.DataFrame(data=[(float(mp.re(point[0])), float(mp.im(point[0])), point[1]) for point in ls], columns=['x','y','colour'], copy=False)
-  df['colour']=df['colour'].astype("category")
-  return df
-
-dfs = [delayed(one_batch)(batch) for batch in range(batches)]
-df = dd.from_delayed(dfs)
-cvs = ds.Canvas(plot_width=4000,plot_height=4000,x_range=(-4,4), y_range=(-4,4), x_axis_type='linear', y_axis_type='linear')
+density = kleinian.limit_set_density([X,Y],seeds,depth,reps,window,resolution,random_seed=random_seed,checkpoint=f'{filename}.npz')
 
-agg = cvs.points(df,'x','y')
+xs, ys = kleinian.density_coordinates(window,resolution)
+agg = xr.DataArray(density.sum(axis=0), coords=[('y',ys),('x',xs)])
 img = tf.shade(agg, cmap="black", min_alpha=0)
 
-#aggc = cvs.points(df,'x','y',ds.by('colour', ds.count()))
+#aggc = xr.DataArray(np.moveaxis(density,0,-1), coords=[('y',ys),('x',xs),('colour',[-2,-1,1,2])])
 #colours = {-2: 'red', -1:'blue', 1:'green', 2:'purple'}
-#img =  tf.shade(aggc)
+#img =  tf.shade(aggc, color_key=colours)
 
 export_image(img, filename, background="white", export_path=".")
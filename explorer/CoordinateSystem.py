@@ -1,3 +1,6 @@
+import raster
+import numpy as np
+
 from PyQt5.QtWidgets import QLabel
 from PyQt5.QtGui import *
 from PyQt5.QtCore import *
@@ -11,6 +14,7 @@ class CoordinateSystem(QLabel):
         self.ratio = (self.windowTR[1]-self.windowBL[1])/(self.windowTR[0]-self.windowBL[0])
         self.resize(400,int(400*self.ratio))
         self.points = None
+        self.images = {}
         self.setMinimumSize(1, 1);
         self.selectedPoint = 0
 
@@ -26,44 +30,53 @@ class CoordinateSystem(QLabel):
         return re + 1j * im
 
     def paintPoints(self, points):
-        self.points = points
-        pixmap = QPixmap(self.size())
-        pixmap.fill()
-        painter = QPainter(pixmap)
-        painter.setPen(QPen(QColor(0,0,0,50), int(self.width()/400)))
-        #painter.scale(self.width() / 100.0, self.height() / 100.0)
+        """ Set the slice points to display (any iterable of complex numbers, including mpmath ones) and redraw.
+        """
+        self.points = np.array([complex(z) for z in points], dtype=np.complex128)
+        self.images = {}
+        self.showBaseImage()
 
-        for point in points:
-            if self.inWindow(point):
-                coords = self.complexToWindowCoords(point)
-                painter.drawPoint(int(coords[0]),int(coords[1]))
+    def baseImage(self):
+        """ Return the image of the slice points at the current size, rasterising them if this size has not been drawn before.
 
-        painter.end()
-        self.setPixmap(pixmap)
+            The buffer backing each QImage is kept with it in self.images, which holds the images of the last few sizes drawn.
+        """
+        size = (self.width(), self.height())
+        if size not in self.images:
+            window = (self.windowBL[0], self.windowTR[0], self.windowBL[1], self.windowTR[1])
+            rgba = raster.blank(size)
+            raster.draw_points(rgba, window, self.points, 'black', radius=max(self.width()//800, 0), alpha=50)
+            if len(self.images) >= 8:
+                del self.images[next(iter(self.images))]
+            self.images[size] = (rgba, QImage(rgba.data, size[0], size[1], rgba.strides[0], QImage.Format_RGBA8888))
+        return self.images[size][1]
 
-        if self.selectedPoint != None:
-            self.selectPoint(self.selectedPoint)
+    def showBaseImage(self):
+        if self.points is not None:
+            self.setPixmap(QPixmap.fromImage(self.baseImage()))
 
     def selectPoint(self,z):
         if self.selectedPoint != z:
             self.selectedPoint = z
             self.selected_changed.emit(complex(z))
-        if self.inWindow(z):
-            pixmap = self.pixmap()
-            painter = QPainter(pixmap)
-            painter.setPen(QPen(QColor(255,0,0), int(self.width()/100)))
+        self.update()
+
+    def paintEvent(self,e):
+        # The selected point is drawn over the pixmap of slice points, which is left untouched.
+        super().paintEvent(e)
+        if self.selectedPoint != None and self.inWindow(self.selectedPoint):
+            painter = QPainter(self)
+            painter.setPen(QPen(QColor(255,0,0), max(int(self.width()/100), 1)))
             coords = self.complexToWindowCoords(self.selectedPoint)
             painter.drawPoint(int(coords[0]),int(coords[1]))
             painter.end()
-            self.setPixmap(pixmap)
 
     def resizeEvent(self,e):
         super().resizeEvent(e)
-        if self.points != None:
+        if self.points is not None:
             self.resize(self.width(),int(self.width()*self.ratio))
-            self.paintPoints(self.points)
+            self.showBaseImage()
 
     def mouseMoveEvent(self,e):
         #super().mouseMoveEvent(e) # Disable this, otherwise the drag event gets sent to KDE and the whole window moves
         self.selectPoint(self.windowCoordsToComplex(e.x(),e.y()))
-
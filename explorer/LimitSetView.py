@@ -2,80 +2,133 @@ import mpmath as mp
 import farey
 import riley
 import kleinian
-import datashader as ds
-import datashader.transfer_functions as tf
-import pandas
-import dask
-import dask.dataframe as dd
-from dask.delayed import delayed
-import matplotlib
-matplotlib.use('Qt5Agg')
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
-from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
-from datashader.mpl_ext import dsshow, alpha_colormap
+import raster
+import numpy as np
+import threading
 
 from PyQt5.QtWidgets import QLabel
 from PyQt5.QtGui import *
 from PyQt5.QtCore import *
 
+window = (-2,2,-2,2)
+resolution = (800,800)
+
+# (depth, reps) of the successive refinements drawn for each selected point; the first is a quick preview.
+stages = [(4, 1000), (8, 10000), (12, 100000), (15, 500000)]
+
+def render_limit_set(density, mu):
+    """ Shade the histogram returned by kleinian.limit_set_density() and draw the sides of the fundamental domain over it.
+
+        Returns:
+          an RGBA buffer as described in raster.py.
+    """
+    rgba = raster.shade(density, ['red','blue','green','purple'])
+    mu = complex(mu)
+    raster.draw_circle(rgba, window, 1/mu, 1/abs(mu), 'red', width=3)
+    raster.draw_circle(rgba, window, -1/mu, 1/abs(mu), 'red', width=3)
+    raster.fill_rectangle(rgba, window, (-1/2,-1/2+0.01,-2,2), 'blue')
+    raster.fill_rectangle(rgba, window, (1/2,1/2+0.01,-2,2), 'blue')
+    return rgba
+
+class LimitSetWorker(QThread):
+    """ A thread which computes limit sets in the background, for the most recently requested point only.
+
+        For each request the limit set is computed at each of the stages in turn, and image_ready is emitted with the RGBA
+        buffer (see raster.py) of the histogram accumulated so far after each one. A new request abandons the computation in progress (by cancelling the kleinian engine), so only the latest point is drawn.
+    """
+    image_ready = pyqtSignal(int, object, name='imageReady')
+
+    def __init__(self, parent=None):
+        super(LimitSetWorker, self).__init__(parent)
+        self.condition = threading.Condition()
+        self.generation = 0
+        self.pending = None
+        self.stopping = False
+
+    def request(self, pOrder, qOrder, mu):
+        """ Start computing the limit set of the group with the given parameters, abandoning the previous request.
+        """
+        with self.condition:
+            self.generation += 1
+            self.pending = (self.generation, pOrder, qOrder, mu)
+            self.condition.notify()
+        kleinian.default_engine().cancel()
+
+    def stop(self):
+        """ Abandon the current request and wait for the thread to finish.
+        """
+        with self.condition:
+            self.stopping = True
+            self.generation += 1
+            self.condition.notify()
+        kleinian.default_engine().cancel()
+        self.wait()
+
+    def stale(self, generation):
+        return self.stopping or generation != self.generation
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.stopping:
+                    self.condition.wait()
+                if self.stopping:
+                    return
+                (generation, pOrder, qOrder, mu) = self.pending
+                self.pending = None
+
+            alpha = mp.exp(2j*mp.pi/pOrder)
+            beta = mp.exp(2j*mp.pi/qOrder)
+            X = farey.generator('X',alpha,beta,mu)
+            Y = farey.generator('Y',alpha,beta,mu)
+            seeds = [farey.fixed_points(0,1,mu,alpha,beta)[0]]
+
+            density = 0
+            for (depth, reps) in stages:
+                if self.stale(generation):
+                    break
+                try:
+                    density = density + kleinian.limit_set_density([X,Y],seeds,depth,reps,window,resolution)
+                except kleinian.LimitSetCancelled:
+                    break
+                if self.stale(generation):
+                    break
+                self.image_ready.emit(generation, render_limit_set(density, mu))
+
 class LimitSetView(QLabel):
     selected_changed = pyqtSignal(complex, name='selectedPointChanged')
     def __init__(self, parent=None):
         super(LimitSetView, self).__init__(parent)
         self.resize(640,480)
         self.setMinimumSize(640, 480);
+        self.setAlignment(Qt.AlignCenter)
+        self.buffer = None
+        self.image = None
+        self.worker = LimitSetWorker(self)
+        self.worker.image_ready.connect(self.showImage)
+        self.worker.start()
 
     def redrawLimitSet(self,pOrder,qOrder,mu):
-        per_batch = 100
-        batches = 10
-        depth = 3
-        alpha = mp.exp(2j*mp.pi/pOrder)
-        beta = mp.exp(2j*mp.pi/qOrder)
-        X = farey.generator('X',alpha,beta,mu)
-        Y = farey.generator('Y',alpha,beta,mu)
-        seeds = farey.fixed_points(0,1,mu,alpha,beta)\
-              + farey.fixed_points(1,1,mu,alpha,beta)\
-              + farey.fixed_points(1,2,mu,alpha,beta)
-
-        seeds = [seeds[0]]
-
-        print("Found fixed points.",flush=True)
-
-        dask.config.set(scheduler='single-threaded') # We are already running in parallel in each batch; if we don't do this then Dask launches
-                                                    # many copies of one_batch() and we get killed by the OOM killer.
-        def one_batch(batch):
-            #print(f"Running batch {batch+1}/{batches}")
-            ls = kleinian.limit_set_markov([X,Y],seeds,depth,per_batch)
-            df = pandas.DataFrame(data=[(float(mp.re(point[0])), float(mp.im(point[0])), point[1]) for point in ls], columns=['x','y','colour'], copy=False)
-            df['colour']=df['colour'].astype("category")
-            return df
-
-        dfs = [delayed(one_batch)(batch) for batch in range(batches)]
-        df = dd.from_delayed(dfs)
-
-        fig = plt.figure(figsize=(8, 6), dpi=160)
-        canvas = FigureCanvas(fig)
-        ax = plt.subplot(111)
-        artist = dsshow(df.compute(), ds.Point('x', 'y'), ds.count_cat('colour'), vmax=1000, aspect='equal',ax=ax)
-        ax.set_xlim([-2, 2])
-        ax.set_ylim([-2, 2])
-
-        faces = [plt.Circle((mp.re(1/mu), mp.im(1/mu)), 1/abs(mu), color='r',fill=False),
-                plt.Circle((-mp.re(1/mu), -mp.im(1/mu)), 1/abs(mu), color='r',fill=False),
-                plt.Rectangle((-1/2,-2),0.01,4),
-                plt.Rectangle((1/2,-2),0.01,4)]
-        for f in faces:
-            ax.add_patch(f)
-
-        canvas.draw()
-        width, height = canvas.get_width_height()[0], canvas.get_width_height()[1]
-        self.resize(width,height)
-        self.image = QImage(canvas.buffer_rgba(), width, height, QImage.Format_ARGB32)
-        print((width,height))
+        """ Start drawing the limit set of the group with the given parameters in the background; the view is updated as the
+            picture is refined, and a later call abandons the drawing in progress.
+        """
+        self.worker.request(pOrder,qOrder,mu)
+
+    def showImage(self,generation,rgba):
+        if generation != self.worker.generation:
+            return
+        # The QImage is a view of the buffer, which must therefore be kept alive with it.
+        self.buffer = rgba
+        self.image = QImage(rgba.data, rgba.shape[1], rgba.shape[0], rgba.strides[0], QImage.Format_RGBA8888)
+        self.rescale()
 
+    def rescale(self):
+        self.setPixmap(QPixmap.fromImage(self.image.scaled(self.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)))
+
+    def stop(self):
+        self.worker.stop()
 
     def resizeEvent(self,e):
         super().resizeEvent(e)
-        self.setPixmap(QPixmap(self.image.scaled(self.size())))
-
+        if self.image is not None:
+            self.rescale()
@@ -19,6 +19,7 @@ ui = Ui_MainWindow()
 ui.setupUi(window)
 pOrder = None
 qOrder = None
+slice_store = riley.SliceStore() # Roots already found are loaded from riley_slice.sqlite rather than solved again.
 
 def show_about_dialog():
     text = "<center>" \
@@ -51,7 +52,7 @@ def slice_parameters_changed(_=None):
 
     fareyDenom = int(ui.fareyDenomEdit.text())
 
-    ui.sliceView.paintPoints(riley.riley_slice(pOrder,qOrder,fareyDenom))
+    ui.sliceView.paintPoints(slice_store.riley_slice(pOrder,qOrder,fareyDenom,parallel=True))
 
 def slice_point_changed_via_edit():
     ui.sliceView.selectPoint(float(ui.muReEdit.text()) + 1j * float(ui.muImEdit.text()))
@@ -85,6 +86,7 @@ if __name__ == '__main__':
     setup_edit(ui.muImEdit,slice_point_changed_via_edit,mu_validator,show_real_validation_failed_dialog)
     ui.sliceView.selected_changed.connect(slice_point_changed_via_click)
     ui.sliceView.selected_changed.connect(limit_parameters_changed)
+    app.aboutToQuit.connect(ui.limitView.stop)
 
     slice_parameters_changed()
     limit_parameters_changed(2j)
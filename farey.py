@@ -12,6 +12,7 @@ import math
 
 from numpy.polynomial import Polynomial as P
 import kleinian
+import sl2
 from functools import cache
 
 
@@ -39,6 +40,12 @@ def generator(letter,alpha,beta,mu):
     except IndexError:
         raise IndexError("Unknown generator for the group")
 
+@cache
+def _sl2_generator(letter,alpha,beta,mu):
+    """ Return generator(letter,alpha,beta,mu) as an sl2.MpSL2, for fast multiplication.
+    """
+    return sl2.MpSL2.from_matrix(generator(letter,alpha,beta,mu))
+
 # Return a string in X and Y representing the r/s Farey word.
 @cache
 def word(r,s):
@@ -69,10 +76,14 @@ def matrix(r,s,mu,alpha,beta):
           r, s --- coprime integers representing the slope r/s
           mu, alpha, beta --- parameters of the group as defined in generator() above
     """
-    w = word(r,s)
-    product = mp.eye(2)
-    for letter in w:
-        product = product * generator(letter,alpha,beta,mu)
+    return _word_product(r,s,mu,alpha,beta).to_mp()
+
+def _word_product(r,s,mu,alpha,beta):
+    """ Compute the Farey word of slope r/s as an sl2.MpSL2; arguments as for matrix().
+    """
+    product = sl2.MpSL2.identity()
+    for letter in word(r,s):
+        product = product * _sl2_generator(letter,alpha,beta,mu)
 
     return product
 
@@ -85,11 +96,11 @@ def fixed_points(r,s,mu,alpha,beta):
     """
 
 
-    m = matrix(r,s,mu,alpha,beta)
-    surd = mp.sqrt((m[1,1] - m[0,0])**2 - 4*m[0,1]*m[1,0])
-    trans = m[0,0] - m[1,1]
+    m = _word_product(r,s,mu,alpha,beta)
+    surd = mp.sqrt((m.d - m.a)**2 + 4*m.b*m.c)
+    trans = m.a - m.d
 
-    return [(trans+surd)/(2*m[1,0]),(trans-surd)/(2*m[1,0])]
+    return [(trans+surd)/(2*m.c),(trans-surd)/(2*m.c)]
 
 @cache
 def next_neighbour(p,q):
@@ -167,7 +178,7 @@ def polynomial_coefficients_fast(r,s,alpha,beta,_=None):
     if r == 1 and s == 1:
         return P([2*mp.re(alpha*beta),1])
     if r == 1 and s == 2:
-        return P([2,-4*mp.im(alpha*beta),1])
+        return P([2,-4*mp.im(alpha)*mp.im(beta),1])
 
     (p1,q1),(p2,q2) = neighbours(r,s)
     konstant = _even_const(alpha,beta) if ((q1 + q2) % 2) == 0 else _odd_const(alpha,beta)
@@ -204,6 +215,60 @@ def polynomial_evaluate(r,s,alpha,beta,z):
 
     return p
 
+@cache
+def recursion_order(r,s):
+    """ Return the steps of the recursion algorithm for the Farey polynomial of slope r/s.
+
+        Arguments:
+          r,s -- coprime integers representing the slope of the desired polynomial
+
+        Returns:
+          a tuple of tuples (slope, parents), one for each slope other than 0/1, 1/1 and 1/2 whose polynomial enters the
+          recursion for the r/s polynomial, in order of increasing denominator. Here parents is the triple of slopes
+          (p1/q1, p2/q2, |p1-p2|/|q1-q2|) whose polynomials give the polynomial of the slope.
+    """
+
+    def parents(r,s):
+        (p1,q1),(p2,q2) = neighbours(r,s)
+        return ((p1,q1),(p2,q2),(int(abs(p1-p2)),int(abs(q1-q2))))
+
+    needed = set()
+    stack = [(r,s)]
+    while stack != []:
+        slope = stack.pop()
+        if slope not in needed and slope not in [(0,1),(1,1),(1,2)]:
+            needed.add(slope)
+            stack.extend(parents(*slope))
+
+    return tuple((slope, parents(*slope)) for slope in sorted(needed, key=lambda slope: slope[1]))
+
+def polynomial_evaluate_derivative(r,s,alpha,beta,z):
+    """ Return the evaluations of the Farey polynomial of slope r/s and of its derivative at z.
+
+        The method used is the recursion algorithm, as in polynomial_evaluate(), differentiated by the product rule. The
+        polynomials in the recursion are evaluated once each, in the order given by recursion_order(), so the cost is
+        roughly proportional to s (and there is no limit on s from the depth of recursion).
+
+        Arguments:
+          r,s -- coprime integers representing the slope of the desired polynomial
+          alpha, beta -- parameters of the group
+          z -- point of evaluation
+
+        Returns:
+          a tuple (value, derivative).
+    """
+
+    values = {(0,1): (2*mp.re(alpha/beta)-z, -1),
+              (1,1): (2*mp.re(alpha*beta)+z, 1),
+              (1,2): (2-4*mp.im(alpha)*mp.im(beta)*z+z**2, -4*mp.im(alpha)*mp.im(beta)+2*z)}
+
+    for ((p,q), (first, second, difference)) in recursion_order(r,s):
+        konstant = _even_const(alpha,beta) if ((first[1] + second[1]) % 2) == 0 else _odd_const(alpha,beta)
+        (v1,d1),(v2,d2),(v3,d3) = values[first], values[second], values[difference]
+        values[(p,q)] = (konstant - (v1*v2 + v3), -(d1*v2 + v1*d2 + d3))
+
+    return values[(r,s)]
+
 @cache
 def polynomial_coefficients_reduced(r,s):
     """ Return the coefficients of the reduced Farey polynomial (\Phi^{\infty,\infty}-2) of slope r/s.
@@ -8,6 +8,8 @@ import mpmath as mp
 import riley
 import kleinian
 import farey
+import raster
+import numpy as np
 
 import tkinter as tk
 from tkinter import ttk, messagebox
@@ -97,13 +99,15 @@ mainframe.grid(column=0, row=1, sticky=(tk.N, tk.W, tk.E, tk.S))
 slice_canvas = tk.Canvas(mainframe,width=scale*(riley_bounds[1]-riley_bounds[0]),height=scale*(riley_bounds[3]-riley_bounds[2]))
 slice_canvas.grid(column=0,row=0)
 
+slice_image = None
 def redraw_slice(points):
+    # Rasterise all the points at once into a single image item, rather than making a canvas item for each point.
+    global slice_image
+    rgba = raster.blank((scale*(riley_bounds[1]-riley_bounds[0]), scale*(riley_bounds[3]-riley_bounds[2])))
+    raster.draw_points(rgba, riley_bounds, np.array([complex(point) for point in points]), 'black', radius=1)
+    slice_image = ImageTk.PhotoImage(Image.fromarray(rgba))
     slice_canvas.delete("all")
-    for point in points:
-        if mp.re(point) > riley_bounds[0]  and mp.re(point) < riley_bounds[1] and mp.im(point) > riley_bounds[2] and mp.im(point) < riley_bounds[3]:
-            radius=1
-            x,y = usual_coords_to_canvas(mp.re(point),mp.im(point))
-            slice_canvas.create_oval(x-radius, y-radius, x + radius, y + radius, fill="black", width=0)
+    slice_canvas.create_image(0, 0, anchor=tk.NW, image=slice_image)
 
 change_slice()
 
@@ -147,13 +151,15 @@ def redraw_limit(canvas_x,canvas_y):
     if current_slice == 'parabolic':
         X = farey.generator('X', 1, 1, x + y*1j)
         Y = farey.generator('Y', 1, 1, x + y*1j)
+        orders = None
     elif current_slice == 'elliptic':
         X = farey.generator('X', mp.exp(1j*mp.pi/elliptic_p), mp.exp(1j*mp.pi/elliptic_q), x + y*1j)
         Y = farey.generator('Y', mp.exp(1j*mp.pi/elliptic_p), mp.exp(1j*mp.pi/elliptic_q), x + y*1j)
+        orders = [elliptic_p, elliptic_q]
     seed = mp.matrix([farey.fixed_points(1,2,Y[1, 0],X[0, 0],Y[0, 0])[0]])
     colours = {-2: 'red', -1:'blue', 1:'green', 2:'purple'}
     limitset_canvas.delete("all")
-    for (point,colour) in kleinian.limit_set_markov([X,Y],seed,limit_set_depth,limit_set_points):
+    for (point,colour) in kleinian.limit_set_markov([X,Y],seed,limit_set_depth,limit_set_points,orders):
         if mp.re(point) > limit_bounds[0]  and mp.re(point) < limit_bounds[1] and mp.im(point) > limit_bounds[2] and mp.im(point) < limit_bounds[3]:
             radius=1
             x,y = usual_coords_to_canvas(float(mp.re(point)),float(mp.im(point)))
@@ -188,7 +194,7 @@ def compute_farey(*args):
             elif current_slice == 'elliptic':
                 matrix = farey.matrix(int(vals[0]),int(vals[1]),complex(selected_position.get()),mp.exp(1j*mp.pi/elliptic_p),mp.exp(1j*mp.pi/elliptic_q))
             fareymatrix.set('matrix = ' + str(matrix))
-            fareytrace.set('tr = ' + str(mp.trace(matrix)))
+            fareytrace.set('tr = ' + str(matrix[0,0] + matrix[1,1]))
 
     except ValueError:
         messagebox.showerror("Error", "Enter the slope in the format p/q with p,q integers")
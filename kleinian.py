@@ -1,12 +1,17 @@
 """ Generic methods for Kleinian groups.
 """
 
-from multiprocessing import Pool
-from mpmath import mp, fp
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+import threading
+import traceback
+import atexit
+import queue
+import os
+import cmath
+from mpmath import mp
 import numpy as np
-import random
-import functools
-import gc
+from sl2 import MpSL2, ComplexSL2, SL2
 
 def _fast_inv(mat):
     """ Invert a 2x2 matrix *assuming it has det 1*.
@@ -14,9 +19,210 @@ def _fast_inv(mat):
     assert((mat.rows,mat.cols) == (2,2))
     return mp.matrix([[mat[1,1],-mat[0,1]],[-mat[1,0],mat[0,0]]])
 
-def limit_set_dfs(generators, seed, depth, coloured, only_leaves=False):
+class Region:
+    """ A disc, the exterior of a disc, or an open half-plane in the complex plane.
+
+        Regions are built with Region.disc(), Region.exterior() and Region.half_plane(), and mapped by Mobius transformations
+        with image(). Images are computed from the closed-form formulae for the image of a circle, so that the radii of very small
+        image discs deep in the group stay accurate.
+
+        Attributes:
+          kind -- one of 'disc', 'exterior', 'half-plane'
+          centre, radius -- centre and radius of the boundary circle (discs and exteriors)
+          point, direction -- a point on the boundary line and the unit normal pointing into the region (half-planes)
+    """
+    __slots__ = ('kind', 'centre', 'radius', 'point', 'direction')
+
+    def __init__(self, kind, centre=None, radius=None, point=None, direction=None):
+        self.kind = kind
+        self.centre = centre
+        self.radius = radius
+        self.point = point
+        self.direction = direction
+
+    def __repr__(self):
+        if self.kind == 'half-plane':
+            return f'Region.half_plane({self.point}, {self.direction})'
+        return f'Region.{self.kind}({self.centre}, {self.radius})'
+
+    @classmethod
+    def disc(cls, centre, radius):
+        """ The open disc with the given centre and radius.
+        """
+        return cls('disc', centre=complex(centre), radius=float(radius))
+
+    @classmethod
+    def exterior(cls, centre, radius):
+        """ The exterior of the closed disc with the given centre and radius (a disc on the Riemann sphere containing infinity).
+        """
+        return cls('exterior', centre=complex(centre), radius=float(radius))
+
+    @classmethod
+    def half_plane(cls, point, direction):
+        """ The open half-plane bounded by the line through point perpendicular to direction, on the side into which direction points.
+        """
+        direction = complex(direction)
+        return cls('half-plane', point=complex(point), direction=direction/abs(direction))
+
+    def image(self, mat):
+        """ Return the image of the region under the Mobius transformation represented by the 2x2 matrix mat (with det 1), which
+            may also be an sl2.SL2.
+        """
+        if isinstance(mat, SL2):
+            (a, b, c, d) = mat.to_complex().entries()
+        else:
+            ((a, b), (c, d)) = _as_complex_matrix(mat)
+        if self.kind != 'half-plane':
+            w = c*self.centre + d
+            denominator = abs(w)**2 - abs(c)**2 * self.radius**2
+            if denominator != 0:
+                centre = ((a*self.centre + b) * w.conjugate() - a * c.conjugate() * self.radius**2) / denominator
+                kind = self.kind if denominator > 0 else ('disc' if self.kind == 'exterior' else 'exterior')
+                return Region(kind, centre=centre, radius=self.radius/abs(denominator))
+
+        # The boundary passes through the pole of the transformation (or is a line); work with the Hermitian form H of the
+        # region, for which the region is {z : (z,1)^* H (z,1) < 0}, and whose determinant is invariant.
+        form = self._form()
+        inverse = np.array([[d, -b], [-c, a]])
+        image = inverse.conj().T @ form @ inverse
+        (coefficient, linear, constant) = (image[0,0].real, image[0,1], image[1,1].real)
+        if coefficient == 0:
+            return Region('half-plane', point=-constant*linear/(2*abs(linear)**2), direction=-linear/abs(linear))
+        radius = np.sqrt(-(form[0,0]*form[1,1] - abs(form[0,1])**2).real) / abs(coefficient)
+        return Region('disc' if coefficient > 0 else 'exterior', centre=-linear/coefficient, radius=radius)
+
+    def _form(self):
+        if self.kind == 'half-plane':
+            return np.array([[0, -self.direction], [-self.direction.conjugate(), 2*(self.direction.conjugate()*self.point).real]])
+        sign = 1 if self.kind == 'disc' else -1
+        return sign * np.array([[1, -self.centre], [-self.centre.conjugate(), abs(self.centre)**2 - self.radius**2]])
+
+    def misses(self, window):
+        """ Return True if the region is certainly disjoint from the rectangle window = (xmin, xmax, ymin, ymax).
+        """
+        (xmin, xmax, ymin, ymax) = window
+        corners = np.array([complex(xmin, ymin), complex(xmin, ymax), complex(xmax, ymin), complex(xmax, ymax)])
+        if self.kind == 'half-plane':
+            return bool(np.all((self.direction.conjugate() * (corners - self.point)).real <= 0))
+        if self.kind == 'disc':
+            # The disc misses the window if the window point nearest its centre is outside it.
+            nearest = complex(min(max(self.centre.real, xmin), xmax), min(max(self.centre.imag, ymin), ymax))
+            return abs(nearest - self.centre) >= self.radius
+        # The exterior of a disc misses the window if the window lies inside the disc.
+        return bool(np.all(np.abs(corners - self.centre) <= self.radius))
+
+def _automaton(n, orders=None):
+    """ Return the finite-state automaton accepting the reduced words in the free product of cyclic groups <g_1, ..., g_n | g_i^orders[i]>.
+
+        A word is reduced if it contains no letter followed by its inverse and, for a generator g of finite order m, no run
+        of more than m//2 copies of g or more than (m-1)//2 copies of its inverse; every element of the group has exactly
+        one reduced spelling. The state of a word is its last letter together with the length of the final run (which is
+        irrelevant for generators of infinite order).
+
+        Arguments:
+          n -- number of generators; the letters are numbered as in _dfs_words() (generators then inverses).
+          orders -- list of the orders of the generators, with None or mp.inf for infinite order (default: all infinite).
+                    An order of 1 or less is treated as infinite, as in the Riley groups where it gives a parabolic generator.
+
+        Returns:
+          int array of shape (S, 2n) where transitions[s,g] is the state reached by appending the letter g to a word in
+          state s, or -1 if the result is not reduced; state 0 is the state of the empty word.
+    """
+    if orders is None:
+        orders = [None] * n
+    if len(orders) != n:
+        raise ValueError('one order is needed for each generator')
+    orders = [None if m is None or m == mp.inf or m <= 1 else int(m) for m in orders]
+    runs = [None if m is None else m//2 for m in orders] + [None if m is None else (m - 1)//2 for m in orders]
+
+    states = [(None, 0)] + [(g, r) for g in range(2*n) for r in range(1, 2 if runs[g] is None else runs[g] + 1)]
+    index = {state: s for s, state in enumerate(states)}
+    transitions = np.full((len(states), 2*n), -1, dtype=np.int64)
+    for s, (last, run) in enumerate(states):
+        for g in range(2*n):
+            if last is not None and g == (last + n) % (2*n):
+                continue
+            following = 1 if g != last or runs[g] is None else run + 1
+            if (g, following) in index:
+                transitions[s, g] = index[(g, following)]
+    if np.any(np.all(transitions < 0, axis=1)):
+        raise ValueError('the group is finite: some reduced words cannot be extended')
+    return transitions
+
+def _dfs_words(generators, max_length, window=None, bound=None, orders=None):
+    """ Enumerate the reduced words in the generators and their inverses up to the given length, depth-first.
+
+        Yields triples (length, matrix, colour) where colour is the initial letter of the word in the format of limit_set_dfs().
+        Only O(max_length) words are held in memory at once. If window and bound are given, a word W is skipped together with
+        all its extensions if W(bound) is disjoint from the window (see limit_set_dfs_stream() for the format of bound).
+        The words are the reduced words of _automaton(n, orders), so each group element is visited at most once if the group
+        is the free product of the cyclic groups generated by the generators.
+    """
+    n = len(generators)
+    letters = [MpSL2.from_matrix(g) for g in generators]
+    letters = letters + [g.inverse() for g in letters]
+    colours = [g+1 for g in range(n)] + [-g-1 for g in range(n)]
+    transitions = _automaton(n, orders).tolist()
+    prune = window is not None and bound is not None
+    if prune and isinstance(bound, Region):
+        bound = [bound] * (2*n)
+
+    # Stack of (length, last letter, state, word, colour); children are pushed in reverse so that they are visited in letter order.
+    stack = [(1, g, transitions[0][g], letters[g], colours[g]) for g in reversed(range(2*n)) if transitions[0][g] >= 0]
+    while stack:
+        (length, last, state, word, colour) = stack.pop()
+        if prune and bound[last].image(word).misses(window):
+            continue
+        yield (length, word, colour)
+        if length < max_length:
+            stack.extend((length + 1, g, transitions[state][g], word * letters[g], colour) for g in reversed(range(2*n))
+                         if transitions[state][g] >= 0)
+
+def _mp_points(points):
+    """ Convert a list, numpy array, or mpmath matrix of complex points to a list of mpmath numbers.
+    """
+    if hasattr(points, 'rows'):
+        return [z for row in points.tolist() for z in row]
+    return [mp.mpmathify(complex(z)) if isinstance(z, np.generic) else mp.mpmathify(z) for z in np.ravel(np.array(points, dtype=object))]
+
+def limit_set_dfs_stream(generators, seed, depth, window=None, bound=None, only_leaves=False, orders=None):
+    """ An iterator yielding points approximating the limit set of a group using a depth-first search.
+
+        Unlike limit_set_dfs(), the words are enumerated one at a time using an explicit stack, so the memory used is
+        proportional to depth rather than to the number of words; points are yielded as soon as they are computed.
+
+        Each point yielded is a pair (p,g) where p is the image of one of the seed points under a reduced word of length at most depth,
+        and g is the initial letter of the word in the format of limit_set_dfs(). Images at infinity are skipped.
+
+        Arguments:
+          generators - list of 2x2 matrix generators *with det 1*
+          seed - complex points to map by the generators to produce the limit limit set
+          depth - maximal word length to generate
+          window - if given, a tuple (xmin, xmax, ymin, ymax); only points inside the window are yielded
+          bound - a Region containing the seed points and all their images under the group; or a list of 2n Regions, one for
+                  each generator followed by one for each inverse, where the region for the letter g need only contain the images
+                  of the seed points under reduced words which do not begin with the inverse of g. If bound and window are both given, words W ending in g such that W(bound[g])
+                  is disjoint from the window are pruned together with all their extensions. For example, for a Schottky group
+                  with pairing discs D_g, the exterior of the disc of the inverse of g is a valid choice of bound[g].
+          only_leaves - if True then yield only the images of seed under the words of length exactly depth (default False)
+          orders - list of the orders of the generators as in limit_set_dfs() (default: all infinite)
+    """
+    seed = _mp_points(seed)
+    for (length, word, colour) in _dfs_words(generators, depth, window, bound, orders):
+        if only_leaves and length < depth:
+            continue
+        for s in seed:
+            point = word.act(s)
+            if mp.isinf(point):
+                continue
+            if window is None or (window[0] <= point.real < window[1] and window[2] <= point.imag < window[3]):
+                yield (point, colour)
+
+def limit_set_dfs(generators, seed, depth, coloured, only_leaves=False, orders=None):
     """ Return an array of points approximating the limit set of a group using a depth-first search.
 
+        For large depths prefer limit_set_dfs_stream(), which does not hold all the words in memory at once.
+
         Arguments:
           generators - list of 2x2 matrix generators
           seed - complex points to map by the generators to produce the limit limit set
@@ -24,108 +230,1104 @@ def limit_set_dfs(generators, seed, depth, coloured, only_leaves=False):
           coloured - if false, return the limit set as a list only; if true, return the limit set as a list of pairs (g,p) where p is a point and g is the initial letter of the word used to generate it
                      in the form of (the position in the generator array + 1) if g is a generator, and the negative of that if g is the inverse of a generator.
           only_leaves - if True then return images of seed under all the words, otherwise return the images only under the longest words (default False)
+          orders - list of the orders of the generators as elements of PSL(2,C), with None or mp.inf for infinite order. Only
+                   reduced words in the free product of the cyclic groups they generate are used: no letter is followed by its
+                   inverse, and no generator of order m appears more than m//2 times in a row (or its inverse more than (m-1)//2
+                   times), so that no element is visited twice in a group such as <X,Y | X^a, Y^b>. Orders of 1 or less are
+                   treated as infinite (default: all infinite)
     """
 
-    # word_list is list of things of the form  (previous generator added, current word, initial generator decorator)
-    decorated_gens = [(g, generators[g], g+1) for g in range(len(generators))]
-    decorated_invs = [(g+len(generators), _fast_inv(generators[g]), -g-1) for g in range(len(generators))]
-    word_list = [decorated_gens + decorated_invs]
+    # Words are returned in order of increasing length, up to length depth+1 (or of length exactly depth if only_leaves is set).
+    words = [w for w in _dfs_words(generators, depth + 1, orders=orders) if not only_leaves or w[0] == depth]
+    words.sort(key=lambda w: w[0])
 
-    generators.extend([_fast_inv(g) for g in generators])
+    seed = _mp_points(seed)
+    limit_set = [([w[1].act(z) for z in seed], w[2]) for w in words]
 
+    if coloured:
+        return limit_set
+    else:
+        return [p[0] for p in limit_set]
+
+limit_point_dtype = np.dtype([('point', np.complex128), ('colour', np.int8)])
+""" Structured dtype of the arrays returned by limit_set_markov_array(): a complex limit point together with the colour code
+    (the first letter of the word used to generate it, in the same signed format as limit_set_markov()).
+"""
+
+def _as_complex_matrix(mat):
+    """ Convert a 2x2 matrix (mpmath or numpy) to a complex128 numpy array.
+    """
+    if hasattr(mat, 'rows'):
+        return np.array([[complex(mat[i,j]) for j in range(2)] for i in range(2)], dtype=np.complex128)
+    return np.array(mat, dtype=np.complex128).reshape(2,2)
+
+def _as_complex_points(points):
+    """ Convert a list, numpy array, or mpmath matrix of complex points to a flat complex128 numpy array.
+    """
+    if hasattr(points, 'rows'):
+        points = [z for row in points.tolist() for z in row]
+    return np.array([complex(z) for z in np.ravel(np.array(points, dtype=object))], dtype=np.complex128)
+
+def _decorate(generators, orders=None, prefix_length=None):
+    """ Return the generators together with their inverses in the form used by the vectorised Markov engine.
+
+        Returns:
+          matrices -- complex128 array of shape (2n,2,2); entry i is generator i if i < n and the inverse of generator i-n otherwise
+          keys -- int8 array of shape (2n,) giving the colour code of each letter (i+1 for generator i, -i-1 for its inverse)
+          transitions -- the automaton of reduced words, as returned by _automaton(n, orders)
+
+        If prefix_length is given, the letters are replaced by the reduced words of that length, as in _prefix_table().
+    """
+    matrices = [_as_complex_matrix(g) for g in generators]
+    matrices = matrices + [np.array([[m[1,1],-m[0,1]],[-m[1,0],m[0,0]]]) for m in matrices]
+    n = len(generators)
+    keys = np.array([g+1 for g in range(n)] + [-g-1 for g in range(n)], dtype=np.int8)
+    if prefix_length is not None and prefix_length > 1:
+        return _prefix_table(np.stack(matrices), keys, _automaton(n, orders), prefix_length)
+    return np.stack(matrices), keys, _automaton(n, orders)
+
+def _exact_group(generators, seed):
+    """ Return the generators, their inverses (in the order of _decorate()) and the seed points at the current precision
+        mp.dps, in the form used by _refine_points().
+    """
+    letters = [MpSL2.from_matrix(g) for g in generators]
+    if hasattr(seed, 'rows'):
+        seed = [z for row in seed.tolist() for z in row]
+    return (tuple(letters + [g.inverse() for g in letters]), tuple(mp.mpmathify(z) for z in np.ravel(np.array(seed, dtype=object))))
+
+def _refinement(exact, tolerance, precision, prefix_length):
+    """ Return the argument exact of _markov_chunk() for the given tolerance and precision, or None if tolerance is None.
+    """
+    if tolerance is None:
+        return None
+    if (prefix_length or 1) != 1:
+        raise ValueError('tolerance cannot be used together with prefix_length')
+    return exact + (tolerance, precision)
+
+def _prefix_table(matrices, keys, transitions, length):
+    """ Return the table of all the reduced words of the given length, in the same form as the letters returned by _decorate().
+
+        A Markov walk which prepends a random entry of the table at each step, rather than a single letter, takes one
+        (batched) matrix product per length letters. Entry t of the table is a sequence of letters c_1, ..., c_length
+        accepted by the automaton, which the walk prepends in that order; so its matrix is c_length ... c_1 and its colour
+        is that of c_length, which becomes the first letter of the word.
+
+        Returns:
+          matrices -- complex128 array of shape (T,2,2) of the products of the words
+          keys -- int8 array of shape (T,) of their colour codes
+          transitions -- int array of shape (S,T) giving the state of the automaton reached by feeding word t to state s,
+                         or -1 if the result is not reduced (the states are those of the original automaton)
+    """
+    (words, _, _) = _reduced_words(transitions, length)
+    products = np.broadcast_to(np.eye(2, dtype=np.complex128), (len(words), 2, 2))
+    for k in range(length):
+        products = matrices[words[:,k]] @ products
+
+    # Feed every word to every state of the automaton.
+    table = np.repeat(np.arange(len(transitions))[:,np.newaxis], len(words), axis=1)
+    for k in range(length):
+        table = np.where(table >= 0, transitions[np.maximum(table, 0), words[:,k]], -1)
+    return products, keys[words[:,-1]], table
+
+def _reduced_words(transitions, length):
+    """ Return all the sequences of letters of the given length accepted by the automaton transitions (see _automaton()).
+
+        Returns:
+          words -- int array of shape (T, length) of the letters of each sequence, in lexicographic order
+          states -- int array of shape (T,) of the states reached at the end of each sequence
+          probabilities -- float array of shape (T,) of the probability that a Markov walk, which chooses uniformly among the
+                           letters allowed at each step, begins with each sequence
+    """
+    words = np.empty((1, 0), dtype=np.int64)
+    states = np.zeros(1, dtype=np.int64)
+    probabilities = np.ones(1)
+    counts = np.count_nonzero(transitions >= 0, axis=1)
+    for _ in range(length):
+        (parent, letter) = np.nonzero(transitions[states] >= 0)
+        words = np.concatenate((words[parent], letter[:,np.newaxis]), axis=1)
+        probabilities = probabilities[parent] / counts[states[parent]]
+        states = transitions[states[parent], letter]
+    return words, states, probabilities
+
+def _random_seed(random_seed=None):
+    """ Return random_seed as a non-negative integer less than 2^64, drawing one from system entropy if it is None.
+    """
+    if random_seed is None:
+        return int(np.random.SeedSequence().generate_state(1, np.uint64)[0])
+    return int(random_seed) % 2**64
+
+_GOLDEN = 0x9E3779B97F4A7C15
+
+def _mix(x):
+    """ The splitmix64 finaliser, applied elementwise to a uint64 array (wrapping modulo 2^64).
+    """
+    x = x ^ (x >> np.uint64(30))
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return x
+
+def _walk_keys(random_seed, first, reps):
+    """ Return the uint64 keys of the walks first, ..., first+reps-1 of the run with the given random seed.
+
+        The k-th letter of walk w is chosen using _mix(key[w] + (k+1)*golden ratio), a counter-based random stream: it
+        depends only on (random_seed, w, k), so every walk is reproducible however the walks are split into chunks.
+    """
+    walks = np.arange(first, first + reps, dtype=np.uint64)
+    return _mix(_mix(np.full(reps, random_seed, dtype=np.uint64)) + walks * np.uint64(_GOLDEN))
+
+def _letter_choices(transitions):
+    """ Return the arrays (choices, counts) used by _next_letters(): row s of choices lists the counts[s] letters allowed in
+        state s of the automaton first.
+    """
+    allowed = transitions >= 0
+    return np.argsort(~allowed, axis=1, kind='stable'), np.count_nonzero(allowed, axis=1).astype(np.uint64)
+
+def _next_letters(choices, counts, state, walk_keys, step):
+    """ Return the letter chosen at the given step by each walk, given the walks' current states and keys (see _walk_keys()).
+
+        Each walk chooses uniformly among the letters which keep its word reduced (in particular, there is no backtracking);
+        the top 32 bits of the random number are scaled to the number of choices by a multiply and shift.
+    """
+    random = _mix(walk_keys + np.uint64(step * _GOLDEN % 2**64))
+    return choices[state, ((random >> np.uint64(32)) * counts[state] >> np.uint64(32)).astype(np.int64)]
+
+_EPSILON = np.finfo(np.float64).eps
+
+def _refine_points(exact, letters, flagged, points):
+    """ Recompute the flagged points of a chunk of walks in mpmath, replaying the walks from their letters.
+
+        Arguments:
+          exact -- tuple (generators, seed, tolerance, precision) as described in _markov_chunk().
+          letters -- int array of shape (reps, depth) of the letters chosen by each walk.
+          flagged -- bool array of the same shape as points.
+          points -- complex128 array of shape (reps, depth, len(seed)), which is updated in place.
+    """
+    (generators, seed, _, precision) = exact
+    with mp.workdps(precision):
+        for w in np.flatnonzero(flagged.any(axis=(1,2))):
+            word = MpSL2.identity()
+            for d in range(np.flatnonzero(flagged[w].any(axis=1))[-1] + 1):
+                word = generators[letters[w,d]] * word
+                for j in np.flatnonzero(flagged[w,d]):
+                    points[w,d,j] = complex(word.act(seed[j]))
+
+def _markov_chunk(matrices, keys, transitions, seed, depth, first, reps, random_seed, out=None, exact=None):
+    """ Run the Markov walks first, ..., first+reps-1 of length depth simultaneously and return the orbits of seed under them.
+
+        Arguments and output format optimised for use in limit_set_markov_array not in user code.
+
+        Arguments:
+          matrices, keys, transitions -- the decorated generators, as returned by _decorate().
+          seed -- complex128 array of points to map by the words.
+          depth -- length of each word.
+          first -- index of the first walk.
+          reps -- number of words to generate.
+          random_seed -- the seed of the run, see _walk_keys().
+          out -- if given, a structured array of dtype limit_point_dtype and length at least depth*reps*len(seed) to write the points into.
+          exact -- if given, a tuple (generators, seed, tolerance, precision) where generators and seed are as returned by
+                   _exact_group(). The words are then renormalised to determinant 1 whenever rounding has moved the
+                   determinant away from 1 (by more than the rounding error of computing it), and the error of each point
+                   relative to 1+|z| is estimated as
+                       (eps*(length+1) + sum of |det W - 1|/|W|^2 over the steps) * |W| * (1+|s|) / |cs+d|
+                   where W = [[a,b],[c,d]] is the word, |W| its largest entry, and s the seed point (this is the relative
+                   rounding error of the entries, magnified by the conditioning of W at s). Points whose estimate exceeds tolerance are recomputed in
+                   mpmath with precision decimal digits.
+
+        Returns:
+          structured array of dtype limit_point_dtype (a view of out, if it was given); the points coming from each walk are contiguous,
+          in order of increasing word length.
+    """
+    seed = np.stack((seed, np.ones(len(seed), dtype=np.complex128)))
+    (choices, counts) = _letter_choices(transitions)
+
+    points = np.empty((reps, depth, seed.shape[1]), dtype=np.complex128)
+    finite = np.empty((reps, depth, seed.shape[1]), dtype=bool)
+    colours = np.empty((reps, depth, seed.shape[1]), dtype=np.int8)
+
+    if exact is not None:
+        letters = np.empty((reps, depth), dtype=np.int64)
+        error = np.empty((reps, depth, seed.shape[1]))
+        drift = np.zeros(reps)
+        conditioning = 1 + np.abs(seed[0])
+
+    walk_keys = _walk_keys(random_seed, first, reps)
+    state = np.zeros(reps, dtype=np.int64)
     for d in range(depth):
-        print("Computing at depth " + str(d+1) + "/"+ str(depth))
-        word_list.append([])
-        for old_word in word_list[d]:
-            word_list[d+1].extend([(g, old_word[1] * generators[g], old_word[2]) for g in range(len(generators)) if g != old_word[0]])
+        letter = _next_letters(choices, counts, state, walk_keys, d + 1)
+        state = transitions[state, letter]
+        words = matrices[letter] if d == 0 else matrices[letter] @ words
+        if exact is not None:
+            letters[:,d] = letter
+            # The determinant is computed with an error of about eps*|W|^2, so only a larger drift is measurable.
+            size = np.abs(words).max(axis=(1,2))
+            determinant = words[:,0,0]*words[:,1,1] - words[:,0,1]*words[:,1,0]
+            noise = 4 * _EPSILON * size**2
+            drift += np.maximum(np.abs(determinant - 1) - noise, 0) / size**2
+            renormalise = np.abs(determinant - 1) > noise
+            words[renormalise] /= np.sqrt(determinant[renormalise])[:,np.newaxis,np.newaxis]
+        image = words @ seed
+        finite[:,d,:] = image[:,1,:] != 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            points[:,d,:] = image[:,0,:] / image[:,1,:]
+            if exact is not None:
+                error[:,d,:] = ((_EPSILON * (d + 1) + drift) * size)[:,np.newaxis] * conditioning / np.abs(image[:,1,:])
+        colours[:,d,:] = keys[letter][:,np.newaxis]
 
-    if only_leaves:
-        word_list = word_list[-2:-1]
+    if exact is not None:
+        flagged = finite & (error > exact[2])
+        _refine_points(exact, letters, flagged, points)
+        finite &= np.isfinite(points)
 
-    seed.rows = 2
-    for i in range(seed.cols):
-      seed[1,i] = 1
-    word_list = [item for sublist in word_list for item in sublist]
-    limit_set_projective = [(w[1] * seed, w[2]) for w in word_list]
+    finite = finite.ravel()
+    if out is None:
+        orbit = np.empty(np.count_nonzero(finite), dtype=limit_point_dtype)
+    else:
+        orbit = out[:np.count_nonzero(finite)]
+    orbit['point'] = points.ravel()[finite]
+    orbit['colour'] = colours.ravel()[finite]
+    return orbit
 
-    if coloured:
-        return [([q[0]/q[1] for q in p[0].transpose()], p[1]) for p in limit_set_projective]
+def _chunks(first, reps, chunk_size):
+    """ Split the walks first, ..., first+reps-1 into consecutive chunks (start, size) of at most chunk_size walks.
+    """
+    return [(start, min(chunk_size, first + reps - start)) for start in range(first, first + reps, chunk_size)]
+
+def _bin_points(orbit, keys, window, resolution, weights=None):
+    """ Return the per-colour 2D histogram of an array of limit points (as produced by _markov_chunk).
+
+        Arguments:
+          orbit -- structured array of dtype limit_point_dtype.
+          keys -- sorted array of the possible colour codes.
+          window -- tuple (xmin, xmax, ymin, ymax).
+          resolution -- tuple (width, height) in pixels.
+          weights -- if given, an array of the weight of each point; the histogram is then a float64 array of the sums of weights
+    """
+    (xmin, xmax, ymin, ymax) = window
+    (width, height) = resolution
+    x = (orbit['point'].real - xmin) * (width / (xmax - xmin))
+    y = (orbit['point'].imag - ymin) * (height / (ymax - ymin))
+    inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+    index = np.searchsorted(keys, orbit['colour'][inside]) * (width * height) \
+          + y[inside].astype(np.int64) * width + x[inside].astype(np.int64)
+    if weights is not None:
+        return np.bincount(index, weights=weights[inside], minlength=len(keys) * width * height).reshape(len(keys), height, width)
+    return np.bincount(index, minlength=len(keys) * width * height).reshape(len(keys), height, width).astype(np.uint32)
+
+def _markov_task(matrices, keys, transitions, seed, depth, first, reps, random_seed, exact=None):
+    """ Run one chunk of Markov walks and return the points.
+
+        Arguments and output format optimised for use in limit_set_markov_array not in user code.
+    """
+    return _markov_chunk(matrices, keys, transitions, seed, depth, first, reps, random_seed, exact=exact)
+
+_attached_buffer = None
+def _attach_buffer(name):
+    """ Return the shared memory block with the given name, attaching to it (and detaching from the previous one) if necessary.
+
+        Used by the LimitSetEngine workers; the block is owned, and eventually unlinked, by the engine in the parent process.
+    """
+    global _attached_buffer
+    if _attached_buffer is None or _attached_buffer.name != name:
+        if _attached_buffer is not None:
+            _attached_buffer.close()
+        try:
+            _attached_buffer = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Before Python 3.13 every attachment is registered with the resource tracker, which would then unlink the block
+            # from under the engine when this worker exits.
+            _attached_buffer = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(_attached_buffer._name, 'shared_memory')
+    return _attached_buffer
+
+def _markov_shared_task(matrices, keys, transitions, seed, depth, first, reps, random_seed, buffer_name, capacity, offset, exact=None):
+    """ Run one chunk of Markov walks and write the points into a shared buffer, starting at offset; return the number of points written.
+
+        Arguments and output format optimised for use in LimitSetEngine not in user code.
+    """
+    buffer = np.ndarray((capacity,), dtype=limit_point_dtype, buffer=_attach_buffer(buffer_name).buf)
+    out = buffer[offset:offset + depth * reps * len(seed)]
+    return len(_markov_chunk(matrices, keys, transitions, seed, depth, first, reps, random_seed, out, exact))
+
+def _density_task(matrices, keys, transitions, seed, depth, first, reps, chunk_size, window, resolution, random_seed, exact=None):
+    """ Run the Markov walks first, ..., first+reps-1 in chunks of chunk_size and accumulate their limit points into a single
+        per-colour histogram.
+
+        Arguments and output format optimised for use in LimitSetEngine not in user code.
+    """
+    colour_keys = np.unique(keys)
+    density = np.zeros((len(colour_keys), resolution[1], resolution[0]), dtype=np.uint32)
+    for (start, size) in _chunks(first, reps, chunk_size):
+        if _task_cancelled():
+            break
+        orbit = _markov_chunk(matrices, keys, transitions, seed, depth, start, size, random_seed, exact=exact)
+        density += _bin_points(orbit, colour_keys, window, resolution)
+    return density
+
+def _window_prefixes(group, length, window, resolution, samples, density=None, floor=0.1):
+    """ Return the table of prefixes used by _window_chunk(), with probabilities favouring the prefixes which map the limit set into the window.
+
+        Each reduced word P of the given length is scored by the proportion of the sample limit points z (those which may
+        follow P in a reduced word) with P(z) in the window; if density is given, each such point is further weighted by
+        1/(1+r), where r is the density of its pixel relative to the mean over the filled pixels, so that prefixes
+        landing in under-filled pixels are preferred. The prefix P is then drawn with probability q(P) proportional to
+        p(P)*score(P), mixed with the fraction floor of p(P) so that no part of the window is starved, where p(P) is the
+        probability that an ordinary Markov walk begins with P.
+
+        An ordinary walk prepends its letters, so P is the last part of the words it generates rather than the first; the
+        importance weight of P is therefore r(P)/q(P), where r(P) is the probability that an ordinary walk of length
+        |P| generates P, i.e. that of the letters of P read from right to left. (With generators of finite order this
+        differs from p(P), since the letters allowed depend on the run of equal letters just read.) _window_chunk()
+        updates the weight as letters are appended.
+
+        Returns:
+          tuple (matrices, keys, states, cumulative, weights, last, single) of arrays indexed by prefix: the product of the
+          prefix, its colour, the state of the automaton after it, the cumulative distribution q, the importance weight, the
+          last letter, and whether all the letters are the same.
+    """
+    (matrices, keys, transitions, _) = group
+    (words, states, natural) = _reduced_words(transitions, length)
+    products = np.broadcast_to(np.eye(2, dtype=np.complex128), (len(words), 2, 2))
+    for k in range(length):
+        products = products @ matrices[words[:,k]]
+
+    # A sample point whose word begins with the letter g may follow P if g is allowed after P.
+    order = np.argsort(keys)
+    letters = order[np.searchsorted(keys[order], samples['colour'])]
+    compatible = transitions[states][:, letters] >= 0
+    z = samples['point'][np.newaxis,:]
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        images = (products[:,0,0,np.newaxis]*z + products[:,0,1,np.newaxis]) / (products[:,1,0,np.newaxis]*z + products[:,1,1,np.newaxis])
+    (xmin, xmax, ymin, ymax) = window
+    (width, height) = resolution
+    x = (images.real - xmin) * (width / (xmax - xmin))
+    y = (images.imag - ymin) * (height / (ymax - ymin))
+    inside = compatible & (x >= 0) & (x < width) & (y >= 0) & (y < height)
+
+    if density is None:
+        score = np.count_nonzero(inside, axis=1) / len(samples)
     else:
-        return [[q[0]/q[1] for q in p[0].transpose()] for p in limit_set_projective]
+        filled = density.sum(axis=0)
+        relative = filled / filled[filled > 0].mean() if np.any(filled > 0) else filled
+        fill = np.zeros(images.shape)
+        fill[inside] = relative[y[inside].astype(np.int64), x[inside].astype(np.int64)]
+        score = np.where(inside, 1 / (1 + fill), 0).sum(axis=1) / len(samples)
+
+    target = natural * score
+    q = natural if target.sum() == 0 else (1 - floor) * target / target.sum() + floor * natural
+    cumulative = np.cumsum(q)
+
+    counts = np.count_nonzero(transitions >= 0, axis=1)
+    reverse = np.ones(len(words))
+    state = np.zeros(len(words), dtype=np.int64)
+    for k in reversed(range(length)):
+        reverse /= counts[state]
+        state = transitions[state, words[:,k]]
+    single = np.all(words == words[:,:1], axis=1)
+    return products, keys[words[:,0]], states, cumulative / cumulative[-1], reverse / q, words[:,-1], single
+
+def _window_chunk(matrices, keys, transitions, seed, depth, first, reps, random_seed, prefixes):
+    """ Run the walks first, ..., first+reps-1, each appending depth letters to a prefix drawn from the table built by
+        _window_prefixes(), and return the orbit of seed under them together with the importance weight of each point.
+
+        The weight of the point of a word W is r(W)/q(W), where r(W) is the probability that an ordinary walk (which
+        prepends letters) generates W and q(W) the probability that this walk does. Reading W from right to left, appending
+        a letter g only changes the states of the automaton along the final run of copies of g; so r is multiplied by
+        1/counts[s'] where s' is the state after g (or, if W is a single run, by 1/counts[s] where s is the state before
+        it), while q is multiplied by 1/counts[s].
+
+        Arguments and output format optimised for use in limit_set_density_window not in user code.
+    """
+    (prefix_matrices, prefix_keys, prefix_states, cumulative, prefix_weights, prefix_last, prefix_single) = prefixes
+    (choices, counts) = _letter_choices(transitions)
+    seed = np.stack((seed, np.ones(len(seed), dtype=np.complex128)))
+    walk_keys = _walk_keys(random_seed, first, reps)
+
+    # Step 0 of the random stream of each walk chooses its prefix.
+    uniform = (_mix(walk_keys) >> np.uint64(11)) * 2.0**-53
+    prefix = np.minimum(np.searchsorted(cumulative, uniform, side='right'), len(cumulative) - 1)
+    words = prefix_matrices[prefix]
+    state = prefix_states[prefix]
+    weight = prefix_weights[prefix]
+    last = prefix_last[prefix]
+    single = prefix_single[prefix]
+
+    points = np.empty((reps, depth, seed.shape[1]), dtype=np.complex128)
+    finite = np.empty((reps, depth, seed.shape[1]), dtype=bool)
+    weights = np.empty((reps, depth))
+    for d in range(depth):
+        letter = _next_letters(choices, counts, state, walk_keys, d + 1)
+        following = transitions[state, letter]
+        single = single & (letter == last)
+        weight = weight * np.where(single, 1.0, counts[state] / counts[following])
+        weights[:,d] = weight
+        (state, last) = (following, letter)
+        words = words @ matrices[letter]
+        image = words @ seed
+        finite[:,d,:] = image[:,1,:] != 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            points[:,d,:] = image[:,0,:] / image[:,1,:]
+
+    finite = finite.ravel()
+    orbit = np.empty(np.count_nonzero(finite), dtype=limit_point_dtype)
+    orbit['point'] = points.ravel()[finite]
+    orbit['colour'] = np.broadcast_to(prefix_keys[prefix][:,np.newaxis,np.newaxis], points.shape).ravel()[finite]
+    return orbit, np.broadcast_to(weights[:,:,np.newaxis], points.shape).ravel()[finite]
+
+def _window_task(matrices, keys, transitions, seed, depth, first, reps, chunk_size, window, resolution, random_seed, prefixes):
+    """ Run the walks first, ..., first+reps-1 of _window_chunk() in chunks of chunk_size and accumulate their weighted histogram.
+
+        Arguments and output format optimised for use in LimitSetEngine not in user code.
+    """
+    colour_keys = np.unique(keys)
+    density = np.zeros((len(colour_keys), resolution[1], resolution[0]))
+    for (start, size) in _chunks(first, reps, chunk_size):
+        if _task_cancelled():
+            break
+        (orbit, weights) = _window_chunk(matrices, keys, transitions, seed, depth, start, size, random_seed, prefixes)
+        density += _bin_points(orbit, colour_keys, window, resolution, weights)
+    return density
+
+def _run_window_density(run, group, depth, reps, window, resolution, chunk_size, parts, random_seed, prefix_length, pilot, adaptive):
+    """ Accumulate the weighted histogram of limit_set_density_window(), running _window_task on blocks of walks using run
+        (as in _run_density()) with each pass split into the given number of parts.
+    """
+    random_seed = _random_seed(random_seed)
+    samples = _markov_chunk(*group, depth, 0, pilot, (random_seed + 1) % 2**64)
+    samples = samples[::max(len(samples) // 1024, 1)]
+
+    density = np.zeros((len(np.unique(group[1])), resolution[1], resolution[0]))
+    first = 0
+    for size in ([reps // 2, reps - reps // 2] if adaptive else [reps]):
+        prefixes = _window_prefixes(group, prefix_length, window, resolution, samples, density if first > 0 else None)
+        arguments = [(depth, start, n, chunk_size, window, resolution, random_seed, prefixes)
+                     for (start, n) in _chunks(first, size, max(-(-size // parts), 1))]
+        for _, partial in run(_window_task, arguments):
+            density += partial
+        first += size
+    return density
+
+def _run_density(run, group, depth, window, resolution, chunk_size, blocks, random_seed, checkpoint, exact=None):
+    """ Accumulate the histograms of the blocks (first, reps) of Markov walks, computed by _density_task using run.
+
+        Here run(function, arguments) yields pairs (index, function(*group, *arguments[index])) in any order, as
+        LimitSetEngine._run() does. If checkpoint is given, the blocks already recorded in it are skipped and it is
+        rewritten after each block finishes.
+    """
+    if random_seed is None and checkpoint is not None and os.path.exists(checkpoint):
+        with np.load(checkpoint) as saved:
+            random_seed = int(saved['random_seed'])
+    parameters = {'matrices': group[0], 'transitions': group[2], 'seed': group[3], 'depth': depth, 'window': window,
+                  'resolution': resolution, 'blocks': blocks, 'random_seed': np.uint64(_random_seed(random_seed)),
+                  'tolerance': -1.0 if exact is None else exact[2]}
+
+    density = np.zeros((len(np.unique(group[1])), resolution[1], resolution[0]), dtype=np.uint32)
+    done = np.zeros(len(blocks), dtype=bool)
+    if checkpoint is not None and os.path.exists(checkpoint):
+        (density, done) = _load_checkpoint(checkpoint, parameters)
+
+    pending = np.flatnonzero(~done)
+    arguments = [(depth, *blocks[k], chunk_size, window, resolution, int(parameters['random_seed']), exact) for k in pending]
+    for index, partial in run(_density_task, arguments):
+        density += partial
+        done[pending[index]] = True
+        if checkpoint is not None:
+            _save_checkpoint(checkpoint, parameters, density, done)
+    return density
+
+def _load_checkpoint(checkpoint, parameters):
+    """ Return the pair (density, done) saved in the checkpoint file, after checking that it was written with the given parameters.
+    """
+    with np.load(checkpoint) as saved:
+        for key, value in parameters.items():
+            if key not in saved or not np.array_equal(saved[key], np.asarray(value)):
+                raise ValueError(f'checkpoint {checkpoint} was written for a different computation ({key} differs)')
+        return saved['density'], saved['done']
+
+def _save_checkpoint(checkpoint, parameters, density, done):
+    """ Write the parameters, histogram and finished blocks to the checkpoint file, atomically replacing the previous one.
+    """
+    temporary = checkpoint + '.tmp'
+    with open(temporary, 'wb') as f:
+        np.savez(f, density=density, done=done, **{key: np.asarray(value) for key, value in parameters.items()})
+    os.replace(temporary, checkpoint)
 
+_worker_job = None
+def _task_cancelled():
+    """ Return True if called from a task of a LimitSetEngine worker whose job has been cancelled, so that long tasks can stop early.
+    """
+    return _worker_job is not None and _worker_job[0] <= _worker_job[1].value
+
+def _engine_worker(control, tasks, results, cancelled):
+    """ Main loop of a LimitSetEngine worker process.
+
+        Groups arrive on the worker's own control queue as pairs (token, group) and tasks on the shared task queue as tuples
+        (job, token, index, function, arguments); the result of function(*group, *arguments) is put on the result queue as
+        (job, index, result). Tasks belonging to cancelled jobs or to superseded groups are skipped.
+    """
+    global _worker_job
+    token, group = 0, None
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        (job, wanted, index, function, arguments) = task
+        if job <= cancelled.value:
+            continue
+        while token < wanted:
+            (token, group) = control.get()
+        if token != wanted:
+            continue
+        _worker_job = (job, cancelled)
+        try:
+            result = function(*group, *arguments)
+        except Exception:
+            result = RuntimeError(traceback.format_exc())
+        results.put((job, index, result))
 
+class LimitSetCancelled(RuntimeError):
+    """ Raised by the methods of LimitSetEngine when the computation was cancelled by LimitSetEngine.cancel().
+    """
+
+class LimitSetEngine:
+    """ A set of long-lived worker processes for computing limit sets using the Markov chain search.
 
-def _dynamics_of_one_word(decorated_gens, seed, depth,rep):
-    """ Generate a word of length depth using a Markov chain and return the orbits of seed under that word.
+        The generators and seeds are shipped to the workers once, by set_group(); afterwards each call to markov() or density()
+        only sends the walk parameters. A computation may be abandoned from another thread by cancel(): the workers then skip
+        the remaining tasks of that computation and are immediately available for the next one.
 
-        Arguments and output format optimised for use in limit_set_markov not in user code.
+        The methods may be called from several threads at once (as happens with the engine shared by default_engine()): the
+        workers, the result queue and the shared result buffer serve one computation at a time, so the computations are run
+        in turn, and set_group() waits for the one in progress to be cancelled.
+
+        Example:
+          with kleinian.LimitSetEngine() as engine:
+              engine.set_group([X,Y], seeds)
+              density = engine.density(15, 1000000, (-2,2,-2,2), (1000,1000))
 
         Arguments:
-          decorated_gens -- list of pairs (n,X) where X is the nth generator (if n > 0) or the inverse of the nth generator (if n < 0).
-          seed - complex points to map by the generators to produce the limit limit set, as points of CP.
-          depth -- length of word to generate.
-          rep -- this is the rep'th repetition in the loop.
+          processes -- number of worker processes (default: one per CPU)
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes or os.cpu_count() or 1
+        self._tasks = multiprocessing.Queue()
+        self._results = multiprocessing.Queue()
+        self._cancelled = multiprocessing.Value('q', 0)
+        self._controls = [multiprocessing.Queue() for _ in range(self.processes)]
+        self._workers = [multiprocessing.Process(target=_engine_worker, args=(control, self._tasks, self._results, self._cancelled), daemon=True)
+                         for control in self._controls]
+        for worker in self._workers:
+            worker.start()
+        self._lock = threading.Lock()
+        # Held for the whole of each computation, and while the group is changed or the engine is closed.
+        self._calls = threading.Lock()
+        self._job = 0
+        self._token = 0
+        self._group = None
+        self._prefix_length = 1
+        self._exact = None
+        self._buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        """ Shut down the worker processes.
+        """
+        if self._workers == []:
+            return
+        self.cancel()
+        with self._calls:
+            for _ in self._workers:
+                self._tasks.put(None)
+            for worker in self._workers:
+                worker.join(timeout=1)
+                if worker.is_alive():
+                    worker.terminate()
+            self._workers = []
+            self._release_buffer()
+
+    def _release_buffer(self):
+        """ Unlink the shared result buffer, so that a new one is allocated by the next call to markov().
+        """
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer.unlink()
+            self._buffer = None
+
+    def _result_buffer(self, capacity):
+        """ Return the shared result buffer as an array of dtype limit_point_dtype with at least the given capacity, allocating it if necessary.
+        """
+        if self._buffer is None or self._buffer.size < capacity * limit_point_dtype.itemsize:
+            self._release_buffer()
+            self._buffer = shared_memory.SharedMemory(create=True, size=max(capacity, 1) * limit_point_dtype.itemsize)
+        return np.ndarray((self._buffer.size // limit_point_dtype.itemsize,), dtype=limit_point_dtype, buffer=self._buffer.buf)
+
+    def set_group(self, generators, seed, orders=None, prefix_length=None):
+        """ Set the group whose limit set is computed by subsequent calls, and cancel any computation in progress.
+
+            Nothing is sent to the workers if the group and seeds are the same as the current ones.
+
+            Arguments:
+              generators - list of 2x2 matrix generators *with det 1* (mpmath or numpy matrices).
+              seed - complex points to map by the generators to produce the limit limit set
+              orders - list of the orders of the generators, used to walk only along reduced words as described in
+                       limit_set_dfs() (default: all infinite)
+              prefix_length - if given, build the table of reduced words of this length once and send it to the workers, which
+                              then walk by prepending whole table entries (see limit_set_markov_array()) (default None)
+        """
+        group = _decorate(generators, orders, prefix_length) + (_as_complex_points(seed),)
+        exact = _exact_group(generators, seed)
+        unchanged = lambda: self._group is not None and all(np.array_equal(old, new) for old, new in zip(self._group, group))
+        if not unchanged():
+            self.cancel()
+        with self._calls:
+            self._prefix_length = prefix_length or 1
+            self._exact = exact
+            if unchanged():
+                return
+            with self._lock:
+                self._token += 1
+                self._group = group
+                for control in self._controls:
+                    control.put((self._token, group))
+
+    def cancel(self):
+        """ Cancel the computation in progress (if any); it will raise LimitSetCancelled.
+
+            This may be called from any thread.
+        """
+        with self._cancelled.get_lock():
+            self._cancelled.value = self._job
+
+    def _run(self, function, arguments):
+        """ Run function(*group, *args) on the workers for each args in arguments, and yield pairs (index, result) in order of completion.
+        """
+        if self._workers == []:
+            raise RuntimeError('the engine has been closed')
+        if self._group is None:
+            raise RuntimeError('no group set: call set_group() first')
+        with self._lock:
+            self._job += 1
+            job = self._job
+            for index, args in enumerate(arguments):
+                self._tasks.put((job, self._token, index, function, args))
+
+        remaining = len(arguments)
+        try:
+            while remaining > 0:
+                if self._cancelled.value >= job:
+                    raise LimitSetCancelled('limit set computation cancelled')
+                try:
+                    (result_job, index, result) = self._results.get(timeout=0.05)
+                except queue.Empty:
+                    continue
+                if result_job != job:
+                    continue
+                if self._cancelled.value >= job:
+                    # The task may have stopped early when it saw the cancellation, so its result is incomplete.
+                    raise LimitSetCancelled('limit set computation cancelled')
+                if isinstance(result, Exception):
+                    raise RuntimeError('limit set worker failed') from result
+                remaining -= 1
+                yield index, result
+        finally:
+            if remaining > 0:
+                with self._cancelled.get_lock():
+                    self._cancelled.value = max(self._cancelled.value, job)
+
+    def markov(self, depth, reps, chunk_size=4096, random_seed=None, tolerance=None, precision=50):
+        """ Return an array of points approximating the limit set of the current group using a Markov chain search.
+
+            See limit_set_markov_array() for the arguments and the format of the output.
+        """
+        with self._calls:
+            return self._markov(depth, reps, chunk_size, random_seed, tolerance, precision)
+
+    def _markov(self, depth, reps, chunk_size, random_seed, tolerance, precision):
+        """ The computation of markov(), run with the engine to itself.
+        """
+        # The workers write their points straight into a shared buffer; only the number of points in each chunk comes back
+        # through the result queue.
+        exact = _refinement(self._exact, tolerance, precision, self._prefix_length)
+        depth = _steps(depth, self._prefix_length)
+        points_per_walk = depth * len(self._group[3])
+        chunks = _chunks(0, reps, chunk_size)
+        offsets = [start * points_per_walk for (start, _) in chunks]
+        buffer = self._result_buffer(reps * points_per_walk)
+        random_seed = _random_seed(random_seed)
+        arguments = [(depth, start, size, random_seed, self._buffer.name, len(buffer), offset, exact)
+                     for (start, size), offset in zip(chunks, offsets)]
+
+        counts = [0] * len(chunks)
+        try:
+            for index, count in self._run(_markov_shared_task, arguments):
+                counts[index] = count
+        except Exception:
+            # Workers may still be writing into the buffer for the abandoned job.
+            self._release_buffer()
+            raise
+        return np.concatenate([buffer[offset:offset + count] for offset, count in zip(offsets, counts)]) if chunks else np.empty(0, dtype=limit_point_dtype)
+
+    def density(self, depth, reps, window, resolution, chunk_size=4096, random_seed=None, checkpoint=None, checkpoint_every=262144,
+                tolerance=None, precision=50):
+        """ Return per-colour 2D histograms of the limit set of the current group computed using a Markov chain search.
+
+            Each worker accumulates its share of the walks into its own histogram (if checkpoint is given, the walks are instead
+            shared out in blocks of checkpoint_every). See limit_set_density() for the arguments and the format of the output.
+        """
+        with self._calls:
+            return self._density(depth, reps, window, resolution, chunk_size, random_seed, checkpoint, checkpoint_every, tolerance,
+                                 precision)
+
+    def _density(self, depth, reps, window, resolution, chunk_size, random_seed, checkpoint, checkpoint_every, tolerance, precision):
+        """ The computation of density(), run with the engine to itself.
+        """
+        exact = _refinement(self._exact, tolerance, precision, self._prefix_length)
+        if checkpoint is None:
+            blocks = _chunks(0, reps, -(-reps // self.processes) if reps > 0 else 1)
+        else:
+            blocks = _chunks(0, reps, checkpoint_every)
+        return _run_density(self._run, self._group, _steps(depth, self._prefix_length), window, resolution, chunk_size, blocks,
+                            random_seed, checkpoint, exact)
+
+    def density_window(self, depth, reps, window, resolution, prefix_length=6, adaptive=True, pilot=1024, chunk_size=4096, random_seed=None):
+        """ Return weighted per-colour 2D histograms of the limit set of the current group, sampling words which land in the window.
+
+            See limit_set_density_window() for the arguments and the format of the output.
+        """
+        with self._calls:
+            if self._prefix_length != 1:
+                raise RuntimeError('density_window() needs a group set without prefix_length')
+            return _run_window_density(self._run, self._group, depth, reps, window, resolution, chunk_size, self.processes,
+                                       random_seed, prefix_length, pilot, adaptive)
+
+def _steps(depth, prefix_length):
+    """ Return the number of steps taken by a Markov walk of the given depth which prepends prefix_length letters at each step.
+    """
+    return -(-depth // (prefix_length or 1))
+
+_engine = None
+def default_engine():
+    """ Return the LimitSetEngine shared by limit_set_markov_array(), limit_set_density() and limit_set_markov(), starting it if necessary.
+
+        These functions may be called from several threads; their computations on the shared engine are run one at a time.
+    """
+    global _engine
+    if _engine is None:
+        _engine = LimitSetEngine()
+        atexit.register(_engine.close)
+    return _engine
+
+def limit_set_markov_array(generators, seed, depth, reps, chunk_size=4096, parallel=True, orders=None, random_seed=None,
+                           prefix_length=None, tolerance=None, precision=50):
+    """ Return an array of points approximating the limit set of a group using a Markov chain search.
+
+        This is the vectorised engine behind limit_set_markov(): many walks are advanced at once as arrays of 2x2 complex128
+        matrices, and each new letter is chosen uniformly among the generators and their inverses which keep the word reduced
+        (so never the inverse of the previous letter, nor a power of an elliptic generator beyond half its order).
+
+        Arguments:
+          generators - list of 2x2 matrix generators *with det 1* (mpmath or numpy matrices).
+          seed - complex points to map by the generators to produce the limit limit set
+          depth - maximal word length to generate
+          reps - how many words to generate
+          chunk_size - number of walks advanced simultaneously by each worker (default 4096)
+          parallel - if True, distribute the chunks over the worker processes of default_engine(); otherwise compute
+                     everything in the calling process (default True)
+          orders - list of the orders of the generators, as in limit_set_dfs() (default: all infinite)
+          random_seed - integer seed of the walks; the k-th walk depends only on random_seed and k, so the same seed gives the
+                        same points whatever the chunk size or number of processes (default: drawn from system entropy)
+          prefix_length - if given, all the reduced words of this length k and their products are tabulated once, and each walk
+                          prepends a random compatible entry of the table at each step instead of a single letter. A walk then
+                          takes ceil(depth/k) matrix products, and only the images under the words of length k, 2k, ...,
+                          ceil(depth/k)*k are returned (default None, i.e. one letter at a time)
+          tolerance - if given, the words are kept at determinant 1 and the rounding error of each point (relative to 1+|z|) is
+                      estimated from the determinant drift and the size of the word; the walks with points whose error may
+                      exceed tolerance are replayed in mpmath and those points recomputed. The generators and seeds should
+                      then be given at (at least) the replay precision. Cannot be combined with prefix_length (default None)
+          precision - number of decimal digits used to replay walks (default 50)
 
         Returns:
-          list of pairs (point,gen) where point is a complex point in the *affine* limit set and gen is the first letter of the word we generated
+          a structured numpy array of dtype limit_point_dtype, with fields 'point' (the complex limit point) and 'colour' (the
+          first letter of the word used to generate it, as described in limit_set_markov()). There are at most depth*reps*len(seed)
+          points; points mapped to infinity are dropped.
     """
+    if parallel:
+        engine = default_engine()
+        engine.set_group(generators, seed, orders, prefix_length)
+        return engine.markov(depth, reps, chunk_size, random_seed, tolerance, precision)
 
-    #print(f'_dynamics_of_one_word {rep}',flush=True)
+    group = _decorate(generators, orders, prefix_length) + (_as_complex_points(seed),)
+    exact = _refinement(_exact_group(generators, seed), tolerance, precision, prefix_length)
+    random_seed = _random_seed(random_seed)
+    orbits = [_markov_task(*group, _steps(depth, prefix_length), start, size, random_seed, exact)
+              for (start, size) in _chunks(0, reps, chunk_size)]
+    return np.concatenate(orbits) if orbits else np.empty(0, dtype=limit_point_dtype)
 
-    # We have to convert backwards and forwards between mpmath and numpy in order to cross the multiprocessing boundary,
-    # due to issues like https://github.com/uqfoundation/dill/issues/238 and https://github.com/sympy/sympy/issues/11999.
-    decorated_gens = {g: mp.matrix(m) for g,m in decorated_gens.items()}
-    seed = mp.matrix(seed)
+def limit_set_density(generators, seed, depth, reps, window, resolution, chunk_size=4096, parallel=True, orders=None,
+                      random_seed=None, checkpoint=None, checkpoint_every=262144, prefix_length=None, tolerance=None, precision=50):
+    """ Return per-colour 2D histograms of the limit set of a group computed using a Markov chain search.
 
-    random.seed()
-    key = random.choice(list(decorated_gens))
-    previous_letter = key
-    image = decorated_gens[key] * seed
+        The walks are exactly those of limit_set_markov_array(), but each worker bins its points into its own histogram
+        as they are produced and only the histograms are returned and summed; so the memory used depends on the size of the
+        image and not on the number of points.
 
-    points = list(filter(lambda x: x[1] != 0, image.T.tolist()))
-    orbit = [(p[0]/p[1], key) for p in points]
+        Arguments:
+          generators - list of 2x2 matrix generators *with det 1* (mpmath or numpy matrices).
+          seed - complex points to map by the generators to produce the limit limit set
+          depth - maximal word length to generate
+          reps - how many words to generate
+          window - tuple (xmin, xmax, ymin, ymax) giving the region of the plane to bin
+          resolution - tuple (width, height) giving the number of bins in each direction
+          chunk_size - number of walks advanced simultaneously by each worker (default 4096)
+          parallel - if True, use the worker processes of default_engine(); otherwise compute everything in the calling process (default True)
+          orders - list of the orders of the generators, as in limit_set_dfs() (default: all infinite)
+          random_seed - integer seed of the walks, as in limit_set_markov_array() (default: the seed stored in the checkpoint
+                        file if there is one, otherwise drawn from system entropy)
+          checkpoint - if given, the name of a file in which the histogram of the walks finished so far is saved (in numpy .npz
+                       format) after every checkpoint_every walks. If the file already exists, the computation resumes from it;
+                       it must have been written by a call with the same group and parameters (default None)
+          checkpoint_every - number of walks between checkpoints (default 262144)
+          prefix_length - length of the tabulated words prepended at each step, as in limit_set_markov_array() (default None)
+          tolerance, precision - replay inaccurate walks in mpmath, as in limit_set_markov_array() (default None, 50)
 
-    for d in range(1,depth):
-        admissable_keys = list(decorated_gens)
-        admissable_keys.remove(-previous_letter)
-        key = random.choice(admissable_keys)
-        previous_letter = key
-        image = decorated_gens[key] * image
-        points = list(filter(lambda x: x[1] != 0, image.T.tolist()))
-        orbit.extend([(np.clongdouble(p[0]/p[1]), key) for p in points])
+        Returns:
+          a uint32 array of shape (2n, height, width) where n is the number of generators. The first axis is indexed by colour
+          code in increasing order (-n, ..., -1, 1, ..., n; see limit_set_markov()), and row 0 is the bottom edge (y = ymin)
+          of the window. Points outside the window are discarded.
+    """
+    if parallel:
+        engine = default_engine()
+        engine.set_group(generators, seed, orders, prefix_length)
+        return engine.density(depth, reps, window, resolution, chunk_size, random_seed, checkpoint, checkpoint_every, tolerance, precision)
 
-    return orbit
+    group = _decorate(generators, orders, prefix_length) + (_as_complex_points(seed),)
+    exact = _refinement(_exact_group(generators, seed), tolerance, precision, prefix_length)
+    blocks = _chunks(0, reps, max(reps, 1) if checkpoint is None else checkpoint_every)
+    run = lambda function, arguments: ((index, function(*group, *args)) for index, args in enumerate(arguments))
+    return _run_density(run, group, _steps(depth, prefix_length), window, resolution, chunk_size, blocks, random_seed, checkpoint, exact)
+
+def limit_set_density_window(generators, seed, depth, reps, window, resolution, prefix_length=6, adaptive=True, pilot=1024,
+                             chunk_size=4096, parallel=True, orders=None, random_seed=None):
+    """ Return per-colour 2D histograms of the part of the limit set of a group lying in a (small) window, by importance sampling.
+
+        When the window covers a small part of the limit set, almost all of the walks of limit_set_density() land outside it.
+        Here each walk instead begins with a reduced word P of length prefix_length, drawn with a probability q(P) which favours
+        the words mapping a pilot sample of the limit set into the window, and then continues for depth letters as an
+        ordinary walk; each of its points, the image of seed under a word W, is counted with weight r(W)/q(W), where r(W) is
+        the probability that an ordinary walk generates W and q(W) the probability that this walk does (see _window_chunk()).
+        The histogram is therefore (up to sampling noise) the same as that of ordinary walks from words of length
+        prefix_length+1, ..., prefix_length+depth, with much less noise inside the window. If adaptive is True, the first half
+        of the walks is used to find the under-filled pixels of the window and the prefixes landing there are favoured in the
+        second half.
+
+        Arguments:
+          generators, seed, depth, reps, window, resolution, chunk_size, parallel, orders -- as for limit_set_density()
+          prefix_length - length of the chosen prefixes; there are about (2n-1)^prefix_length of them (default 6)
+          adaptive - if True, sample in two passes as above (default True)
+          pilot - number of ordinary walks used to sample the limit set when scoring the prefixes (default 1024)
+          random_seed - integer seed of the walks (default: drawn from system entropy)
+
+        Returns:
+          a float64 array of the same shape and layout as the output of limit_set_density(), holding the sum of the weights
+          of the points in each bin.
+    """
+    if parallel:
+        engine = default_engine()
+        engine.set_group(generators, seed, orders)
+        return engine.density_window(depth, reps, window, resolution, prefix_length, adaptive, pilot, chunk_size, random_seed)
+
+    group = _decorate(generators, orders) + (_as_complex_points(seed),)
+    run = lambda function, arguments: ((index, function(*group, *args)) for index, args in enumerate(arguments))
+    return _run_window_density(run, group, depth, reps, window, resolution, chunk_size, 1, random_seed, prefix_length, pilot,
+                               adaptive)
+
+def density_coordinates(window, resolution):
+    """ Return the coordinates of the pixel centres of a histogram returned by limit_set_density().
 
-def limit_set_markov(generators, seed, depth, reps):
+        Arguments:
+          window, resolution -- as passed to limit_set_density()
+
+        Returns:
+          a pair (xs, ys) of arrays of length width and height respectively.
+    """
+    (xmin, xmax, ymin, ymax) = window
+    (width, height) = resolution
+    return (xmin + (np.arange(width) + 0.5) * (xmax - xmin) / width,
+            ymin + (np.arange(height) + 0.5) * (ymax - ymin) / height)
+
+def limit_set_markov(generators, seed, depth, reps, orders=None, random_seed=None, tolerance=None, precision=50):
     """ An iterator yielding points points approximating the limit set of a group using a Markov chain search.
 
         The number of points generated will be depth*reps. Each point yelded is a list of pairs (g,p) where p is a complex-valued limit
         set point and g is the initial letter of the word used to generate it in the form of (the position in the generator array + 1)
         if g is a generator, and the negative of that if g is the inverse of a generator.
 
+        This is a thin wrapper around limit_set_markov_array(), which should be preferred in new code.
+
         Arguments:
           generators - list of 2x2 matrix generators *with det 1*.
           seed - complex points to map by the generators to produce the limit limit set
           depth - maximal word length to generate
           reps - how many words to generate
+          orders - list of the orders of the generators, as in limit_set_dfs() (default: all infinite)
+          random_seed - integer seed of the walks, as in limit_set_markov_array() (default: drawn from system entropy)
+          tolerance, precision - replay inaccurate walks in mpmath, as in limit_set_markov_array() (default None, 50)
+    """
+    for pair in limit_set_markov_array(generators, seed, depth, reps, orders=orders, random_seed=random_seed, tolerance=tolerance,
+                                       precision=precision):
+        yield (mp.mpmathify(complex(pair['point'])), int(pair['colour']))
+
+def _attracting_fixed_point(mat):
+    """ Return the attracting fixed point of a Mobius transformation (either fixed point, if it is parabolic or elliptic) as a
+        projective pair (z,w) of Python complex numbers representing the point z/w.
+
+        Arguments:
+          mat -- a ComplexSL2
+    """
+    (a, b, c, d) = mat.entries()
+    if c == 0:
+        # Fixes infinity, which is attracting if |a| > 1; the other fixed point is b/(d-a).
+        return (1, 0) if abs(a) >= abs(d) else (b, d - a)
+    surd = cmath.sqrt((a - d)**2 + 4*b*c)
+    z1, z2 = (a - d + surd)/(2*c), (a - d - surd)/(2*c)
+    return (z1 if abs(c*z1 + d) >= abs(c*z2 + d) else z2, 1)
+
+def limit_curve(generators, epsilon, max_depth=50):
+    """ An iterator yielding polylines approximating the limit set of a two-generator group, following the algorithm of Chapter 7 of
+        "Indra's Pearls" by David Mumford, Caroline Series, and David Wright (Cambridge Uni. Press, 2002).
+
+        Reduced words are explored depth-first in cyclic order (a, b, A, B), and a branch ending in the word W is terminated as soon
+        as the images under W of the fixed points of the cyclic permutations of the commutator ending in the last letter of W
+        (and of that letter itself) lie within epsilon of each other. These images are emitted in order, so if the limit set is
+        a curve (for example if the group is quasi-Fuchsian with parabolic commutator, as in the groups of Grandma's recipe) the
+        result is an ordered approximation to the curve at uniform resolution epsilon. Otherwise the curve breaks up into many
+        short polylines.
+
+        Arguments:
+          generators -- list [a,b] of two 2x2 matrix generators *with det 1* (mpmath or numpy matrices).
+          epsilon -- resolution of the approximation.
+          max_depth -- maximal word length; branches which are not resolved at this length are emitted anyway (default 50).
+
+        Yields:
+          complex128 numpy arrays of consecutive points on the limit set.
+    """
+    if len(generators) != 2:
+        raise ValueError('limit_curve() requires exactly two generators')
+    gens = [ComplexSL2.from_matrix(g) for g in generators]
+    gens = gens + [g.inverse() for g in gens]
+
+    # For the letter k the special points are the fixed points of gen[k-1] gen[k-2] gen[k-3] gen[k], of gen[k], and of
+    # gen[k+1] gen[k+2] gen[k+3] gen[k]; they are the endpoints and the midpoint of the piece of the curve lying under k.
+    special = []
+    for k in range(4):
+        left = gens[(k-1) % 4] * gens[(k-2) % 4] * gens[(k-3) % 4] * gens[k]
+        right = gens[(k+1) % 4] * gens[(k+2) % 4] * gens[(k+3) % 4] * gens[k]
+        special.append([_attracting_fixed_point(left), _attracting_fixed_point(gens[k]), _attracting_fixed_point(right)])
+
+    def image(word, point):
+        denominator = word.c*point[0] + word.d*point[1]
+        return (word.a*point[0] + word.b*point[1])/denominator if denominator != 0 else complex('inf')
+
+    polyline = []
+    stack = [(gens[k], k, 1) for k in reversed(range(4))]
+    while stack:
+        (word, k, length) = stack.pop()
+        points = [image(word, z) for z in special[k]]
+        if length < max_depth and not all(abs(points[i+1] - points[i]) < epsilon for i in range(2)):
+            # Children in the cyclic order k-1, k, k+1, which continues the curve in the direction of the special points.
+            stack.extend((word * gens[j % 4], j % 4, length + 1) for j in (k+1, k, k-1))
+            continue
+
+        # A leaf which continues the curve starts where the previous one ended; otherwise (or at infinity) start a new polyline.
+        # Points within one leaf are always joined, since leaves cut off at max_depth near parabolic points may be coarse.
+        if polyline != [] and not (abs(points[0] - polyline[-1]) < epsilon):
+            if len(polyline) > 1:
+                yield np.array(polyline)
+            polyline = []
+        for z in points:
+            if not cmath.isfinite(z):
+                if len(polyline) > 1:
+                    yield np.array(polyline)
+                polyline = []
+            elif polyline == [] or z != polyline[-1]:
+                polyline.append(z)
+    if len(polyline) > 1:
+        yield np.array(polyline)
+
+def _fill_disc(layer, centre, radius, window, resolution):
+    """ Add one to every pixel of layer (of shape (height, width), as in limit_set_density()) whose centre lies in the given disc.
     """
-    decorated_gens = { (g + 1): generators[g] for g in range(len(generators))}
-    decorated_gens.update({(-g - 1): _fast_inv(generators[g]) for g in range(len(generators))})
+    (xmin, xmax, ymin, ymax) = window
+    (width, height) = resolution
+    (dx, dy) = ((xmax - xmin) / width, (ymax - ymin) / height)
+    columns = slice(max(int((centre.real - radius - xmin) / dx), 0), min(int((centre.real + radius - xmin) / dx) + 1, width))
+    rows = slice(max(int((centre.imag - radius - ymin) / dy), 0), min(int((centre.imag + radius - ymin) / dy) + 1, height))
+    xs = xmin + (np.arange(columns.start, max(columns.stop, columns.start)) + 0.5) * dx
+    ys = ymin + (np.arange(rows.start, max(rows.stop, rows.start)) + 0.5) * dy
+    layer[rows, columns] += np.abs(xs[np.newaxis,:] + 1j*ys[:,np.newaxis] - centre) < radius
+
+def limit_set_discs(generators, regions, window, resolution, max_depth=100):
+    """ Return per-colour rasters of the limit set of a group computed by following the images of a nested family of discs.
 
+        Here regions[g] is the Region which the letter g maps the complement of the region of its inverse onto, so that (as for
+        a Schottky group, or the fundamental domain of a Riley group bounded by isometric circles) the image of region[g] under
+        a reduced word W not ending in the inverse of g is contained in the image of region[h] under W with its last letter h
+        removed. These images are computed depth-first with the closed-form formulae for the image of a circle; a branch is
+        dropped as soon as its region misses the window, and stops when its region is a disc of diameter less than a pixel,
+        which is then filled in. Every part of the limit set inside the window is therefore drawn, with no gaps, after a number of
+        operations proportional to the number of pixels it covers.
+
+        Arguments:
+          generators - list of 2x2 matrix generators *with det 1* (mpmath or numpy matrices).
+          regions - list of 2n Regions, one for each generator followed by one for each inverse (see Region).
+          window - tuple (xmin, xmax, ymin, ymax) giving the region of the plane to draw
+          resolution - tuple (width, height) giving the number of pixels in each direction
+          max_depth - maximal word length; discs still larger than a pixel at this length are filled in, and other regions
+                      are dropped (default 100)
+
+        Returns:
+          a uint32 array in the format returned by limit_set_density(); each pixel counts the final discs covering it, and
+          the colour of a disc is the first letter of its word.
+    """
+    n = len(generators)
+    if len(regions) != 2*n:
+        raise ValueError('limit_set_discs() requires one region for each generator and each inverse')
+    letters = [ComplexSL2.from_matrix(g) for g in generators]
+    letters = letters + [g.inverse() for g in letters]
+    keys = _decorate(generators)[1]
+    colour_keys = np.sort(keys)
+    pixel = min((window[1] - window[0]) / resolution[0], (window[3] - window[2]) / resolution[1])
 
-    # We have to convert backwards and forwards between mpmath and numpy in order to cross the multiprocessing boundary,
-    # due to issues like https://github.com/uqfoundation/dill/issues/238 and https://github.com/sympy/sympy/issues/11999.
-    decorated_gens = {g: np.matrix(fp.matrix(m).tolist(),dtype=np.clongdouble) for g,m in decorated_gens.items()}
-    seed = np.array(seed,dtype=np.clongdouble)
+    density = np.zeros((2*n, resolution[1], resolution[0]), dtype=np.uint32)
+    (centres, colours) = ([], [])
 
-    seed = np.stack((seed,np.ones(len(seed))))
+    # Stack of (length, last letter, colour, prefix, region) where region is the image of regions[last] under prefix, the
+    # word with the last letter removed.
+    identity = ComplexSL2.identity()
+    stack = [(1, g, keys[g], identity, regions[g]) for g in reversed(range(2*n))]
+    while stack:
+        (length, last, colour, prefix, region) = stack.pop()
+        if region.misses(window):
+            continue
+        if region.kind == 'disc' and 2*region.radius < pixel:
+            centres.append(region.centre)
+            colours.append(colour)
+            continue
+        if length >= max_depth:
+            if region.kind == 'disc':
+                _fill_disc(density[np.searchsorted(colour_keys, colour)], region.centre, region.radius, window, resolution)
+            continue
+        word = prefix * letters[last]
+        stack.extend((length + 1, g, colour, word, regions[g].image(word)) for g in reversed(range(2*n)) if g != (last + n) % (2*n))
 
-    limit_set = []
-    with Pool() as pool:
-        for orbit in pool.imap(functools.partial(_dynamics_of_one_word, decorated_gens, seed, depth), range(reps)):
-            for pair in orbit:
-                yield (mp.mpmathify(pair[0]),pair[1])
-            del orbit
-    #for orbit in map(functools.partial(_dynamics_of_one_word, decorated_gens, seed, depth), range(reps)):
-        #for pair in orbit:
-            #yield pair
+    leaves = np.empty(len(centres), dtype=limit_point_dtype)
+    leaves['point'] = centres
+    leaves['colour'] = colours
+    return density + _bin_points(leaves, colour_keys, window, resolution)
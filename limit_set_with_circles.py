@@ -3,13 +3,17 @@
     This is only as accurate as the riley.cusp_point() function allows (i.e. make sure you have
     sacrificed the correct number of goats before running the script...).
 
-    Limit set is plotted using datashader and dask.
+    The limit set is drawn by pushing the sides of the fundamental domain (the isometric circles of Y and its inverse, and the
+    lines Re z = +-1/2 paired by X) through the group until they are smaller than a pixel (see kleinian.limit_set_discs), and
+    the image is shaded using datashader. This needs the parabolic case p = q = mp.inf, where these sides bound a
+    fundamental domain; otherwise the limit set is sampled with random words (see kleinian.limit_set_density).
 
     Options to change:
         p, q -- orders of the elliptic elements (set to mp.inf for the parabolic case)
         r, s -- slope of the desired cusp
-        per_batch, batches -- you should be able to run kleinian.limit_set_markov with reps set to `per_batch'; we do this `batches' times (so we don't run out of RAM).
-        depth -- maximum word length to compute orbits with
+        reps -- number of words to generate (only used if p or q is finite)
+        depth -- maximum word length to compute orbits with (only used if p or q is finite)
+        window, resolution -- region of the plane to plot and size of the image in pixels
 """
 
 
@@ -17,16 +21,12 @@ import mpmath as mp
 import kleinian
 import riley
 import farey
-import datashader as ds
+import numpy as np
+import xarray as xr
 import datashader.transfer_functions as tf
-import pandas
-import dask
-import dask.dataframe as dd
-from dask.delayed import delayed
 from datashader.utils import export_image
 
 import matplotlib.pyplot as plt
-from datashader.mpl_ext import dsshow, alpha_colormap
 
 # Orders of elliptics
 p = mp.inf
@@ -36,9 +36,10 @@ q = mp.inf
 #r = 1
 #s = 3
 
-per_batch = 1000
-batches = 20
+reps = 20000
 depth = 15
+window = (-2,2,-2,2) # xmin, xmax, ymin, ymax
+resolution = (1000,1000)
 
 
 
@@ -60,25 +61,20 @@ seeds = [seeds[0]]
 
 print("Found fixed points.",flush=True)
 
-dask.config.set(scheduler='single-threaded') # We are already running in parallel in each batch; if we don't do this then Dask launches
-                                             # many copies of one_batch() and we get killed by the OOM killer.
-def one_batch(batch):
-  print(f"Running batch {batch+1}/{batches}")
-  ls = kleinian.limit_set_markov([X,Y],seeds,depth,per_batch)
-  df = pandas.DataFrame(data=[(float(mp.re(point[0])), float(mp.im(point[0])), point[1]) for point in ls], columns=['x','y','colour'], copy=False)
-  df['colour']=df['colour'].astype("category")
-  return df
-
-dfs = [delayed(one_batch)(batch) for batch in range(batches)]
-df = dd.from_delayed(dfs)
-#cvs = ds.Canvas(plot_width=4000,plot_height=4000,x_range=(-4,4), y_range=(-3,3), x_axis_type='linear', y_axis_type='linear')
-
-#agg = cvs.points(df,'x','y')
-#img = tf.shade(agg, cmap="black", min_alpha=0)
+if p == mp.inf and q == mp.inf:
+    # X maps Re z > -1/2 onto Re z > 1/2, and Y maps the outside of the circle about -1/mu onto the inside of the circle about 1/mu.
+    regions = [kleinian.Region.half_plane(1/2, 1), kleinian.Region.disc(1/mu, 1/abs(mu)),
+               kleinian.Region.half_plane(-1/2, -1), kleinian.Region.disc(-1/mu, 1/abs(mu))]
+    density = kleinian.limit_set_discs([X,Y],regions,window,resolution)
+else:
+    density = kleinian.limit_set_density([X,Y],seeds,depth,reps,window,resolution)
+xs, ys = kleinian.density_coordinates(window,resolution)
+aggc = xr.DataArray(np.moveaxis(density,0,-1), coords=[('y',ys),('x',xs),('colour',[-2,-1,1,2])])
+colours = {-2: 'red', -1:'blue', 1:'green', 2:'purple'}
 
 plt.figure()
 ax = plt.subplot(111)
-artist = dsshow(df.compute(), ds.Point('x', 'y'), ds.count_cat('colour'), vmax=1000, aspect='equal',ax=ax)
+ax.imshow(tf.shade(aggc, color_key=colours).to_pil(), extent=window, aspect='equal')
 ax.set_xlim([-2, 2])
 ax.set_ylim([-2, 2])
 
@@ -91,8 +87,4 @@ for f in faces:
 
 plt.show()
 
-#aggc = cvs.points(df,'x','y',ds.by('colour', ds.count()))
-#colours = {-2: 'red', -1:'blue', 1:'green', 2:'purple'}
-#img =  tf.shade(aggc)
-
-#export_image(img, filename, background="white", export_path=".")
+#export_image(tf.shade(aggc, color_key=colours), filename, background="white", export_path=".")
@@ -0,0 +1,99 @@
+""" Drawing into numpy RGBA buffers, for the interactive programs (graphical_limits.py and the explorer).
+
+    A buffer is a C-contiguous uint8 array of shape (height, width, 4) with row 0 at the top, as used by QImage.Format_RGBA8888;
+    a window (xmin, xmax, ymin, ymax) gives the region of the complex plane covered by the buffer. Nothing here depends on Qt.
+"""
+
+import numpy as np
+
+colours = {'white': (255,255,255), 'black': (0,0,0), 'red': (255,0,0), 'green': (0,128,0), 'blue': (0,0,255), 'purple': (128,0,128)}
+
+def blank(resolution, colour='white'):
+    """ Return an opaque buffer of the given (width, height) filled with a colour.
+    """
+    (width, height) = resolution
+    rgba = np.empty((height, width, 4), dtype=np.uint8)
+    rgba[...,:3] = colours[colour]
+    rgba[...,3] = 255
+    return rgba
+
+def shade(density, colour_names, background='white', min_alpha=40):
+    """ Return an opaque buffer showing a per-colour histogram, as returned by kleinian.limit_set_density().
+
+        Each non-empty pixel is drawn in the average of the colours of its points (weighted by count), with an opacity rising
+        from min_alpha to 255 with the logarithm of the number of points, over the background colour.
+
+        Arguments:
+          density -- array of shape (n, height, width), with row 0 at the bottom of the window
+          colour_names -- list of n names of colours (keys of raster.colours), one for each layer of density
+    """
+    density = np.asarray(density, dtype=np.float64)[:,::-1,:]
+    total = density.sum(axis=0)
+    palette = np.array([colours[name] for name in colour_names], dtype=np.float64)
+    filled = total > 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.einsum('khw,kc->hwc', density, palette) / total[...,np.newaxis]
+        alpha = np.where(filled, min_alpha + (255 - min_alpha) * np.log1p(total) / np.log1p(total.max()), 0) / 255
+
+    rgba = blank((density.shape[2], density.shape[1]), background)
+    rgba[filled,:3] = np.rint(alpha[filled,np.newaxis] * mean[filled] + (1 - alpha[filled,np.newaxis]) * rgba[filled,:3]).astype(np.uint8)
+    return rgba
+
+def to_pixels(rgba, window, z):
+    """ Return the (float) column and row coordinates in the buffer of the complex points z.
+    """
+    (xmin, xmax, ymin, ymax) = window
+    (height, width) = rgba.shape[:2]
+    z = np.asarray(z, dtype=np.complex128)
+    return (z.real - xmin) * width / (xmax - xmin), (ymax - z.imag) * height / (ymax - ymin)
+
+def plot(rgba, columns, rows, colour, radius=0, alpha=255):
+    """ Paint the pixels at the given (float) coordinates, and those within radius pixels of them, in a colour; coordinates
+        outside the buffer are ignored.
+
+        The colour is painted with the given opacity alpha (0 to 255) once for each point covering a pixel, so that where
+        translucent points pile up the colour darkens.
+    """
+    (height, width) = rgba.shape[:2]
+    columns = np.floor(np.ravel(columns)).astype(np.int64)
+    rows = np.floor(np.ravel(rows)).astype(np.int64)
+    counts = np.zeros(height * width)
+    for dx in range(-radius, radius+1):
+        for dy in range(-radius, radius+1):
+            if dx*dx + dy*dy > radius*radius:
+                continue
+            (x, y) = (columns + dx, rows + dy)
+            inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+            counts += np.bincount(y[inside] * width + x[inside], minlength=height * width)
+
+    covered = counts > 0
+    coverage = 1 - (1 - alpha/255) ** counts[covered]
+    pixels = rgba.reshape(-1, 4)
+    pixels[covered,:3] = np.rint(coverage[:,np.newaxis] * colours[colour] + (1 - coverage[:,np.newaxis]) * pixels[covered,:3]).astype(np.uint8)
+    pixels[covered,3] = 255
+
+def draw_points(rgba, window, points, colour, radius=0, alpha=255):
+    """ Draw the complex points as dots of the given radius (in pixels) and opacity (see plot()).
+    """
+    (columns, rows) = to_pixels(rgba, window, points)
+    plot(rgba, columns, rows, colour, radius, alpha)
+
+def draw_circle(rgba, window, centre, radius, colour, width=1):
+    """ Draw the circle of the given centre and radius (in the plane) as a line width pixels wide.
+    """
+    (columns, rows) = to_pixels(rgba, window, [centre, centre + radius])
+    pixel_radius = abs(columns[1] - columns[0])
+    # Sample the circle at about two points per pixel of its circumference.
+    theta = np.linspace(0, 2*np.pi, max(int(4*np.pi*pixel_radius), 8), endpoint=False)
+    plot(rgba, columns[0] + pixel_radius*np.cos(theta), rows[0] - pixel_radius*np.sin(theta), colour, width // 2)
+
+def fill_rectangle(rgba, window, rectangle, colour):
+    """ Fill the rectangle (xmin, xmax, ymin, ymax) of the plane, which is drawn at least one pixel wide and high.
+    """
+    (xmin, xmax, ymin, ymax) = rectangle
+    (columns, rows) = to_pixels(rgba, window, [xmin + 1j*ymax, xmax + 1j*ymin])
+    (height, width) = rgba.shape[:2]
+    (left, top) = (int(np.floor(columns[0])), int(np.floor(rows[0])))
+    (right, bottom) = (max(int(np.ceil(columns[1])), left + 1), max(int(np.ceil(rows[1])), top + 1))
+    rgba[max(top,0):min(bottom,height), max(left,0):min(right,width), :3] = colours[colour]
+    rgba[max(top,0):min(bottom,height), max(left,0):min(right,width), 3] = 255
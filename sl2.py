@@ -0,0 +1,123 @@
+""" A compact type for 2x2 matrices of determinant 1, i.e. elements of SL(2,C) acting as Mobius transformations.
+
+    The general-purpose mp.matrix class allocates lists, checks bounds on every index, and multiplies by generic loops, which
+    dominates the cost of forming long words in the generators. The classes here keep the four entries in slots and use the
+    2x2 formulae directly. MpSL2 stores mpmath numbers (at the working precision mp.dps) and ComplexSL2 stores Python complex
+    numbers (double precision); otherwise they have the same interface.
+"""
+
+from mpmath import mp
+import numpy as np
+
+class SL2:
+    """ Base class of the 2x2 matrices [[a,b],[c,d]] with determinant 1; use MpSL2 or ComplexSL2.
+
+        Matrices are multiplied with *, and indexed like mpmath or numpy matrices (m[0,1] is b). The determinant is assumed, not
+        checked, to be 1 (inverse() relies on this).
+
+        Attributes:
+          a, b, c, d -- the entries of the matrix
+    """
+    __slots__ = ('a', 'b', 'c', 'd')
+
+    def __init__(self, a, b, c, d):
+        convert = self._convert
+        self.a = convert(a)
+        self.b = convert(b)
+        self.c = convert(c)
+        self.d = convert(d)
+
+    @staticmethod
+    def _convert(x):
+        raise NotImplementedError('use MpSL2 or ComplexSL2')
+
+    @classmethod
+    def _raw(cls, a, b, c, d):
+        """ Build a matrix from entries which are already of the right type.
+        """
+        m = object.__new__(cls)
+        m.a = a
+        m.b = b
+        m.c = c
+        m.d = d
+        return m
+
+    @classmethod
+    def identity(cls):
+        """ Return the identity matrix.
+        """
+        return cls(1, 0, 0, 1)
+
+    @classmethod
+    def from_matrix(cls, mat):
+        """ Convert a 2x2 matrix (an SL2, an mpmath matrix, a numpy array, or a nested list) to this type.
+        """
+        if isinstance(mat, SL2):
+            return cls(mat.a, mat.b, mat.c, mat.d)
+        if hasattr(mat, 'rows'):
+            return cls(mat[0,0], mat[0,1], mat[1,0], mat[1,1])
+        ((a, b), (c, d)) = np.asarray(mat, dtype=object).reshape(2,2)
+        return cls(a, b, c, d)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.a!s}, {self.b!s}, {self.c!s}, {self.d!s})'
+
+    def __getitem__(self, index):
+        return (self.a, self.b, self.c, self.d)[2*index[0] + index[1]]
+
+    def __mul__(self, other):
+        """ Return the matrix product self*other (of the type of self).
+        """
+        (a, b, c, d) = (self.a, self.b, self.c, self.d)
+        (p, q, r, s) = (other.a, other.b, other.c, other.d)
+        return self._raw(a*p + b*r, a*q + b*s, c*p + d*r, c*q + d*s)
+
+    __matmul__ = __mul__
+
+    def inverse(self):
+        """ Return the inverse matrix (the adjugate, since the determinant is 1).
+        """
+        return self._raw(self.d, -self.b, -self.c, self.a)
+
+    def trace(self):
+        """ Return the trace a+d.
+        """
+        return self.a + self.d
+
+    def entries(self):
+        """ Return the tuple (a,b,c,d) of entries.
+        """
+        return (self.a, self.b, self.c, self.d)
+
+    def act(self, z):
+        """ Return the image (az+b)/(cz+d) of the point z under the Mobius transformation, where z may be infinite;
+            the image of the pole -d/c is infinite.
+        """
+        if mp.isinf(z):
+            return self.a / self.c if self.c != 0 else self._convert(mp.inf)
+        denominator = self.c*z + self.d
+        if denominator == 0:
+            return self._convert(mp.inf)
+        return (self.a*z + self.b) / denominator
+
+    def to_mp(self):
+        """ Return the matrix as an mpmath matrix.
+        """
+        return mp.matrix([[self.a, self.b], [self.c, self.d]])
+
+    def to_complex(self):
+        """ Return the matrix as a ComplexSL2 (rounding the entries to double precision if necessary).
+        """
+        return self if isinstance(self, ComplexSL2) else ComplexSL2(self.a, self.b, self.c, self.d)
+
+class MpSL2(SL2):
+    """ A 2x2 matrix of determinant 1 with mpmath entries; see SL2.
+    """
+    __slots__ = ()
+    _convert = staticmethod(mp.mpmathify)
+
+class ComplexSL2(SL2):
+    """ A 2x2 matrix of determinant 1 with Python complex (double precision) entries; see SL2.
+    """
+    __slots__ = ()
+    _convert = staticmethod(complex)
@@ -17,7 +17,7 @@ maxdenom = 100
 mp.dps = 100
 
 print(f'Began run at {datetime.now()}')
-ls = riley.riley_slice(ordera,orderb,maxdenom) # See documentation for this function in riley.py.
+ls = riley.riley_slice(ordera,orderb,maxdenom,parallel=True) # See documentation for this function in riley.py.
 
 count = len(ls)
 print(f'Finished computing points at {datetime.now()}')